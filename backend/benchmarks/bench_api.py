@@ -0,0 +1,480 @@
+"""
+Load benchmark of the HTTP API against a seeded local database.
+
+Starts the app through create_app() with DATABASE_URL pointing at a local
+database and seeds it with --foods synthetic foods built from the
+starter-foods templates. Each scenario is then measured twice: sequentially
+through one Flask test client for latency percentiles, and with --threads
+threads driving the WSGI app concurrently for throughput.
+
+    listing        GET /api/foods/?limit=50 (anonymous, first page)
+    category       GET /api/foods/category/<id>?limit=50 (anonymous)
+    detail         GET /api/foods/<id> (anonymous, public foods)
+    search         GET /api/foods/search?include=..&exclude=.. (anonymous)
+    text_search    GET /api/foods/text-search?q=.. (anonymous)
+    login          POST /auth/login
+    create         PUT /api/foods/ (signed in)
+    update         PATCH /api/foods/<id> (signed in, own private foods)
+
+The default database is a SQLite file in a temporary directory, created and
+seeded for the run. --database-url takes any SQLAlchemy URL, e.g. a local
+MySQL or MariaDB server: an empty database is seeded, a populated one is
+used as it is (the benchmark user and the foods of the create scenario are
+added to it).
+
+Results are written as JSON (--output). --compare reads an earlier result
+file, prints the change per scenario and exits with status 1 if a scenario's
+throughput dropped by more than --max-regression.
+
+Usage:
+    uv run python benchmarks/bench_api.py --foods 10000 --output bench.json
+    uv run python benchmarks/bench_api.py --foods 100000 --threads 8 --compare bench.json
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, NamedTuple
+import yaml
+
+STARTER_FOODS = os.path.join(os.path.dirname(__file__), "..", "..", "starter-foods")
+SERVING_UNITS = ('g', 'mg', 'oz', 'lb', 'tsp', 'tbsp', 'cup', 'item')
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+# Private foods of the benchmark user, edited by the update scenario
+EDITABLE_FOODS = 200
+SEED_BATCH_SIZE = 5000
+
+
+class Template(NamedTuple):
+    name: str
+    brand: str | None
+    category: str
+    cuisine: str | None
+    restrictions: tuple[str, ...]
+    ingredients: tuple[str, ...]
+    nutrition: dict
+
+
+class Fixtures(NamedTuple):
+    """
+    Ids the scenarios pick from.
+    """
+    public_ids: list[int]
+    editable_ids: list[int]
+    category_ids: list[int]
+    restriction_ids: list[int]
+    search_words: list[str]
+    templates: list[Template]
+
+
+def load_templates(directory: str) -> list[Template]:
+    templates = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.yaml")) + glob.glob(os.path.join(directory, "*.yml"))):
+        with open(path) as file:
+            data = yaml.safe_load(file) or {}
+        nutrition = data.get("nutrition") or {}
+        fats = nutrition.get("fats") or {}
+        servings = data.get("servings") or {}
+        unit = servings.get("unit")
+        templates.append(Template(
+            name=str(data.get("name") or os.path.basename(path)).strip(),
+            brand=(str(data["brand"]).strip() if data.get("brand") else None),
+            category=str(data.get("category") or "other"),
+            cuisine=(str(data["cuisine"]) if data.get("cuisine") else None),
+            restrictions=tuple(dict.fromkeys(str(name) for name in data.get("dietary_restrictions") or [])),
+            ingredients=tuple(dict.fromkeys(str(name) for name in data.get("ingredients") or ["food"])),
+            nutrition={
+                "dietary_fiber": float(nutrition.get("dietary_fiber") or 0),
+                "sugars": float(nutrition.get("total_sugars") or 0),
+                "protein": float(nutrition.get("protein") or 0),
+                "carbs": float(nutrition.get("carbohydrates") or 0),
+                "cal": float(servings.get("calories") or 0),
+                "cholesterol": float(nutrition.get("cholesterol") or 0),
+                "sodium": float(nutrition.get("sodium") or 0),
+                "trans_fats": float(fats.get("trans") or 0),
+                "total_fats": float(fats.get("total") or 0),
+                "sat_fats": float(fats.get("saturated") or 0),
+                "serving_amt": float(servings.get("size") or 1),
+                "serving_unit": unit if unit in SERVING_UNITS else "item",
+            },
+        ))
+    if not templates:
+        raise SystemExit(f"No food templates found in {directory}")
+    return templates
+
+
+def configure_environment(database_url: str) -> None:
+    """
+    Settings create_app() reads. Existing environment variables win, so e.g.
+    COUNT_CACHE_TTL=0 can be benchmarked as well.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("APP_HOME", tempfile.gettempdir())
+    # The benchmark measures latency itself; keep the slow request log quiet
+    os.environ.setdefault("SLOW_REQUEST_MS", "0")
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+
+
+def seed(foods: int, templates: list[Template], rng: random.Random) -> None:
+    """
+    Fills an empty database with foods cycling through the templates, spread
+    over a few owners and publication statuses, plus the benchmark user and
+    its editable private foods.
+    """
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from allergy_snatcher.models.database import (
+        db, User, Password, Category, Cuisine, DietaryRestriction, Food, Ingredient, DietRestrictAssoc
+    )
+
+    bench_user = User(username=BENCH_USER, email="bench@example.com", role="user")
+    owners = [User(username=f"owner{i}", email=f"owner{i}@example.com", role="user") for i in range(20)]
+    db.session.add_all([bench_user, *owners, Password(password_hash=generate_password_hash(BENCH_PASSWORD), user=bench_user)])
+    categories = {name: Category(category=name) for name in sorted({t.category for t in templates})}
+    cuisines = {name: Cuisine(cuisine=name) for name in sorted({t.cuisine for t in templates if t.cuisine})}
+    restrictions = {
+        name: DietaryRestriction(restriction=name)
+        for name in sorted({name for t in templates for name in t.restrictions})
+    }
+    db.session.add_all([*categories.values(), *cuisines.values(), *restrictions.values()])
+    db.session.flush()
+
+    statuses = ("public",) * 8 + ("private", "unlisting")
+    total = foods + EDITABLE_FOODS
+    for start in range(0, total, SEED_BATCH_SIZE):
+        food_rows, ingredient_rows, assoc_rows = [], [], []
+        for i in range(start, min(start + SEED_BATCH_SIZE, total)):
+            template = templates[i % len(templates)]
+            editable = i >= foods
+            food_id = i + 1
+            food_rows.append({
+                "id": food_id,
+                "name": f"{template.name} #{i // len(templates)}",
+                "brand": template.brand,
+                "publication_status": "private" if editable else statuses[rng.randrange(len(statuses))],
+                "user_id": (bench_user if editable else owners[i % len(owners)]).id,
+                "category_id": categories[template.category].id,
+                "cuisine_id": cuisines[template.cuisine].id if template.cuisine else None,
+                **template.nutrition,
+            })
+            ingredient_rows += [{"food_id": food_id, "ingredient_name": name} for name in template.ingredients]
+            assoc_rows += [{"food_id": food_id, "restriction_id": restrictions[name].id} for name in template.restrictions]
+        db.session.execute(insert(Food), food_rows)
+        db.session.execute(insert(Ingredient), ingredient_rows)
+        if assoc_rows:
+            db.session.execute(insert(DietRestrictAssoc), assoc_rows)
+        print(f"  seeded {min(start + SEED_BATCH_SIZE, total)}/{total} foods", file=sys.stderr)
+    db.session.commit()
+
+
+def load_fixtures(templates: list[Template]) -> Fixtures:
+    from allergy_snatcher.models.database import db, User, Category, DietaryRestriction, Food
+
+    bench_user_id = db.session.query(User.id).filter(User.username == BENCH_USER).scalar()
+    public_ids = [row[0] for row in db.session.query(Food.id).filter(Food.publication_status == "public").limit(10000)]
+    editable_ids = [
+        row[0] for row in db.session.query(Food.id)
+        .filter(Food.user_id == bench_user_id, Food.publication_status == "private")
+        .limit(EDITABLE_FOODS)
+    ]
+    words = sorted({word.lower() for t in templates for word in t.name.split() if word.isalpha() and len(word) > 3})
+    return Fixtures(
+        public_ids=public_ids,
+        editable_ids=editable_ids,
+        category_ids=[row[0] for row in db.session.query(Category.id)],
+        restriction_ids=[row[0] for row in db.session.query(DietaryRestriction.id)],
+        search_words=words or ["food"],
+        templates=templates,
+    )
+
+
+def ensure_bench_user() -> None:
+    """
+    Adds the benchmark user to a database that was seeded elsewhere.
+    """
+    from werkzeug.security import generate_password_hash
+    from allergy_snatcher.models.database import db, User, Password
+
+    if db.session.query(User.id).filter(User.username == BENCH_USER).scalar() is None:
+        user = User(username=BENCH_USER, email="bench@example.com", role="user")
+        db.session.add_all([user, Password(password_hash=generate_password_hash(BENCH_PASSWORD), user=user)])
+        db.session.commit()
+
+
+def log_in(client) -> None:
+    response = client.post("/auth/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    if response.status_code != 200:
+        raise SystemExit(f"Benchmark login failed: {response.status_code} {response.get_data(as_text=True)}")
+
+
+# --- Scenarios: (client, rng, fixtures) -> response -------------------------
+
+def listing(client, rng, fixtures):
+    return client.get("/api/foods/?limit=50")
+
+def category(client, rng, fixtures):
+    return client.get(f"/api/foods/category/{rng.choice(fixtures.category_ids)}?limit=50")
+
+def detail(client, rng, fixtures):
+    return client.get(f"/api/foods/{rng.choice(fixtures.public_ids)}")
+
+def search(client, rng, fixtures):
+    include, exclude = rng.sample(fixtures.restriction_ids, 2) if len(fixtures.restriction_ids) > 1 else (fixtures.restriction_ids[0], "")
+    return client.get(f"/api/foods/search?include={include}&exclude={exclude}&limit=50")
+
+def text_search(client, rng, fixtures):
+    return client.get(f"/api/foods/text-search?q={rng.choice(fixtures.search_words)[:5]}&limit=50")
+
+def login(client, rng, fixtures):
+    return client.post("/auth/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+
+def create(client, rng, fixtures):
+    template = rng.choice(fixtures.templates)
+    return client.put("/api/foods/", json={
+        "name": f"{template.name} (benchmark)",
+        "brand": template.brand,
+        "category_id": rng.choice(fixtures.category_ids),
+        "ingredients": [{"ingredient_name": name} for name in template.ingredients],
+        "dietary_restriction_ids": list(template.restrictions),
+        **template.nutrition,
+    })
+
+def update(client, rng, fixtures):
+    return client.patch(f"/api/foods/{rng.choice(fixtures.editable_ids)}", json={
+        "brand": f"Brand {rng.randrange(1000)}", "cal": float(rng.randrange(50, 500)),
+    })
+
+
+class Scenario(NamedTuple):
+    run: Callable
+    signed_in: bool
+
+
+SCENARIOS = {
+    "listing": Scenario(listing, False),
+    "category": Scenario(category, False),
+    "detail": Scenario(detail, False),
+    "search": Scenario(search, False),
+    "text_search": Scenario(text_search, False),
+    "login": Scenario(login, False),
+    "create": Scenario(create, True),
+    "update": Scenario(update, True),
+}
+
+
+def latency_summary(seconds: list[float]) -> dict[str, float]:
+    if not seconds:
+        return {}
+    ordered = sorted(seconds)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "mean": statistics.fmean(ordered) * 1000,
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": ordered[-1] * 1000,
+    }
+
+
+def sequential(app, scenario: Scenario, fixtures: Fixtures, requests: int, warmup: int, seed: int) -> dict:
+    """
+    Latency of requests issued one after another through one test client.
+    """
+    client = app.test_client()
+    if scenario.signed_in:
+        log_in(client)
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        scenario.run(client, rng, fixtures)
+
+    latencies, errors = [], 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = scenario.run(client, rng, fixtures)
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code >= 400
+    return {"requests": requests, "errors": errors, "latency_ms": latency_summary(latencies)}
+
+
+def concurrent(app, scenario: Scenario, fixtures: Fixtures, threads: int, requests: int, seed: int) -> dict:
+    """
+    Throughput of requests issued by several threads, each driving the WSGI
+    app through its own test client.
+    """
+    per_thread = max(1, requests // threads)
+    ready = threading.Barrier(threads + 1)
+    latencies: list[list[float]] = [[] for _ in range(threads)]
+    errors = [0] * threads
+
+    def worker(index: int) -> None:
+        client = app.test_client()
+        if scenario.signed_in:
+            log_in(client)
+        rng = random.Random(seed + index)
+        ready.wait()
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            try:
+                status = scenario.run(client, rng, fixtures).status_code
+            except Exception:
+                status = 500
+            latencies[index].append(time.perf_counter() - started)
+            errors[index] += status >= 400
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = per_thread * threads
+    return {
+        "threads": threads,
+        "requests": total,
+        "errors": sum(errors),
+        "seconds": elapsed,
+        "throughput_rps": total / elapsed,
+        "latency_ms": latency_summary([value for values in latencies for value in values]),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict, current: dict, max_regression: float) -> int:
+    """
+    Prints the change per scenario and returns the number of scenarios whose
+    throughput dropped by more than max_regression.
+    """
+    regressions = 0
+    for key in ("database", "foods", "threads", "requests"):
+        if previous.get("meta", {}).get(key) != current["meta"][key]:
+            print(f"Note: {key} differs ({previous.get('meta', {}).get(key)} before, {current['meta'][key]} now)")
+    print(f"\n{'scenario':12s} {'rps before':>11s} {'rps now':>9s} {'change':>8s} {'p95 before':>11s} {'p95 now':>9s}")
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        rps_before = before["concurrent"]["throughput_rps"]
+        rps_now = result["concurrent"]["throughput_rps"]
+        change = rps_now / rps_before - 1
+        regressed = change < -max_regression
+        regressions += regressed
+        print(
+            f"{name:12s} {rps_before:11.1f} {rps_now:9.1f} {change:+8.1%} "
+            f"{before['sequential']['latency_ms']['p95']:9.2f}ms {result['sequential']['latency_ms']['p95']:7.2f}ms"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="SQLAlchemy database URL (default: a SQLite file in a temporary directory)")
+    parser.add_argument("--foods", type=int, default=10000, help="synthetic foods to seed into an empty database")
+    parser.add_argument("--templates", default=STARTER_FOODS, help="directory of food YAML templates")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated scenarios to run")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and phase")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--threads", type=int, default=4, help="threads of the concurrent phase")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and request parameters")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="throughput drop that fails --compare (fraction)")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - SCENARIOS.keys()
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        # Importing the module runs create_app() with the environment set above
+        from allergy_snatcher.__main__ import app
+        from allergy_snatcher.models.database import db, Food
+
+        templates = load_templates(args.templates)
+        rng = random.Random(args.seed)
+        with app.app_context():
+            if db.session.query(Food.id).limit(1).scalar() is None:
+                print(f"Seeding {args.foods} foods from {len(templates)} templates", file=sys.stderr)
+                seed(args.foods, templates, rng)
+            else:
+                ensure_bench_user()
+            fixtures = load_fixtures(templates)
+            food_count = db.session.query(Food.id).count()
+            dialect = db.engine.dialect.name
+
+        results = {
+            "meta": {
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "database": dialect,
+                "foods": food_count,
+                "requests": args.requests,
+                "threads": args.threads,
+                "seed": args.seed,
+            },
+            "scenarios": {},
+        }
+        for name in args.scenarios.split(","):
+            scenario = SCENARIOS[name]
+            if name == "update" and not fixtures.editable_ids:
+                print(f"{name:12s} skipped: the database has no private foods of the benchmark user", file=sys.stderr)
+                continue
+            result = {
+                "sequential": sequential(app, scenario, fixtures, args.requests, args.warmup, args.seed),
+                "concurrent": concurrent(app, scenario, fixtures, args.threads, args.requests, args.seed),
+            }
+            results["scenarios"][name] = result
+            latency = result["sequential"]["latency_ms"]
+            print(
+                f"{name:12s} p50 {latency['p50']:8.2f} ms  p95 {latency['p95']:8.2f} ms  "
+                f"{result['concurrent']['throughput_rps']:8.1f} req/s ({args.threads} threads)  "
+                f"errors {result['sequential']['errors'] + result['concurrent']['errors']}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+        regressions = compare(previous, results, args.max_regression)
+        if regressions:
+            print(f"{regressions} scenarios lost more than {args.max_regression:.0%} throughput")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
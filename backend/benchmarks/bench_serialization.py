@@ -0,0 +1,77 @@
+"""
+Compares the per-row FoodSchema + jsonify serialization path with the batch
+TypeAdapter path used by the food listing endpoints in routes/endpoints.py.
+
+No database is needed: the rows are transient Food ORM instances shaped like
+a listing page.
+
+Usage:
+    uv run python benchmarks/bench_serialization.py --rows 500 --repeat 50
+"""
+
+import argparse
+import json
+import timeit
+from flask import Flask, jsonify
+from allergy_snatcher.models.database import Food, Category, Cuisine, DietaryRestriction, DietRestrictAssoc
+from allergy_snatcher.models.http import FoodSchema, FoodListAdapter
+
+
+def make_foods(rows: int, restrictions_per_food: int) -> list[Food]:
+    categories = [Category(id=i, category=f"category {i}") for i in range(1, 11)]
+    cuisines = [Cuisine(id=i, cuisine=f"cuisine {i}") for i in range(1, 6)]
+    restrictions = [DietaryRestriction(id=i, restriction=f"restriction {i}") for i in range(1, 12)]
+    foods = []
+    for i in range(rows):
+        food = Food(
+            id=i + 1, name=f"Food {i}", brand="Brand", publication_status="public",
+            dietary_fiber=2.0, sugars=1.5, protein=3.0, carbs=20.0, cal=150.0,
+            cholesterol=0.0, sodium=410.0, trans_fats=0.0, total_fats=1.0, sat_fats=0.0,
+            serving_amt=1.33, serving_unit="tbsp",
+            category=categories[i % len(categories)],
+            cuisine=cuisines[i % len(cuisines)] if i % 3 else None,
+        )
+        for j in range(restrictions_per_food):
+            food.restriction_associations.append(
+                DietRestrictAssoc(restriction=restrictions[(i + j) % len(restrictions)])
+            )
+        foods.append(food)
+    return foods
+
+
+def per_row(foods) -> bytes:
+    """The original listing path: ORM -> FoodSchema -> dict -> jsonify."""
+    return jsonify([FoodSchema.model_validate(f).model_dump() for f in foods]).get_data()
+
+
+def batch(foods) -> bytes:
+    """The batch path: one TypeAdapter validation and a direct dump to JSON bytes."""
+    return FoodListAdapter.dump_json(FoodListAdapter.validate_python(foods, from_attributes=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="foods per page")
+    parser.add_argument("--restrictions", type=int, default=3, help="dietary restrictions per food")
+    parser.add_argument("--repeat", type=int, default=50, help="serializations per measurement")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    foods = make_foods(args.rows, args.restrictions)
+
+    with app.app_context():
+        assert json.loads(per_row(foods)) == json.loads(batch(foods)), "serializers disagree"
+
+        results = {}
+        for name, fn in (("per_row", per_row), ("batch", batch)):
+            best = min(timeit.repeat(lambda: fn(foods), number=args.repeat, repeat=5))
+            results[name] = best / args.repeat * 1000
+
+    print(f"{args.rows} rows, {args.restrictions} restrictions each")
+    for name, ms in results.items():
+        print(f"  {name:8s} {ms:8.3f} ms/page")
+    print(f"  speedup  {results['per_row'] / results['batch']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Gunicorn server hooks. Gunicorn loads ./gunicorn.conf.py from the directory it
+is started in, which is the backend directory in the Docker images and
+docker-compose.
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker writes its metrics to files in
+that directory and /metrics merges them (see models/metrics.py). The files of
+a previous run are removed when gunicorn starts, and the live gauges of a
+worker are dropped when it exits.
+"""
+
+import os
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith('.db'):
+                os.remove(os.path.join(directory, name))
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -2,6 +2,15 @@ from flask import Flask
 import os
 from allergy_snatcher.models.database import db
 from allergy_snatcher.routes.auth import init_app as auth_init_app
+from allergy_snatcher.models.cache import init_app as cache_init_app
+from allergy_snatcher.models.instrumentation import init_app as instrumentation_init_app
+from allergy_snatcher.models.food_changes import init_app as food_changes_init_app
+from allergy_snatcher.models.restriction_index import init_app as restriction_index_init_app
+from allergy_snatcher.models.text_search import init_app as text_search_init_app
+from allergy_snatcher.models.counts import init_app as counts_init_app
+from allergy_snatcher.models.pool import init_app as pool_init_app
+from allergy_snatcher.models.replicas import init_app as replicas_init_app
+from allergy_snatcher.models.metrics import init_app as metrics_init_app
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash
 from allergy_snatcher.models.database import User, Password
@@ -26,16 +35,60 @@ def create_app() -> Flask:
     admin_password = os.environ.get('ADMIN_PASSWORD', 'change-me')
     
 
-    if not all([db_user, db_password, db_host, db_port, db_name]):
+    # A full SQLAlchemy URL replaces the DB_* settings, e.g. a local SQLite file for benchmarks/bench_api.py
+    database_url = os.environ.get('DATABASE_URL')
+
+    if not database_url and not all([db_user, db_password, db_host, db_port, db_name]):
         raise ValueError('One or more database environment variables are not set')
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url or f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    # Read replicas (comma separated host[:port]) serving the @read_only routes, one bind each
+    replica_binds = {}
+    for i, replica in enumerate(filter(None, os.environ.get('DB_READ_HOSTS', '').split(','))):
+        host, _, port = replica.strip().partition(':')
+        replica_binds[f'replica_{i}'] = f'mysql+pymysql://{db_user}:{db_password}@{host}:{port or db_port}/{db_name}'
+    app.config['SQLALCHEMY_BINDS'] = replica_binds
+    app.config['READ_REPLICA_BINDS'] = list(replica_binds)
+    # Seconds between replica health checks, and how long a client that wrote keeps reading from the primary
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.environ.get('REPLICA_CHECK_INTERVAL', 10))
+    app.config['REPLICA_STICKY_SECONDS'] = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', None) # Change this in production
     app.config['ADMIN_PASSWORD'] = admin_password
     if not app.config['SECRET_KEY']:
         raise ValueError('SECRET_KEY is not set')
 
+    # Per-worker cache of resolved session tokens (seconds, entries). A TTL of 0 disables it.
+    # Logout, token refresh and role changes only drop the entries of the worker that handles
+    # them: in every other gunicorn worker a revoked token keeps working for up to this TTL.
+    app.config['SESSION_CACHE_TTL'] = float(os.environ.get('SESSION_CACHE_TTL', 30))
+    app.config['SESSION_CACHE_SIZE'] = int(os.environ.get('SESSION_CACHE_SIZE', 1024))
+    # Per-worker cache of the category/cuisine/dietary restriction listings (seconds)
+    app.config['LOOKUP_CACHE_TTL'] = float(os.environ.get('LOOKUP_CACHE_TTL', 300))
+    # Seconds between full rebuilds of the per-worker dietary restriction search index
+    app.config['RESTRICTION_INDEX_TTL'] = float(os.environ.get('RESTRICTION_INDEX_TTL', 60))
+    # Text search backend: 'auto' uses MySQL FULLTEXT when available, 'memory' forces the in-process index
+    app.config['FULLTEXT_SEARCH'] = os.environ.get('FULLTEXT_SEARCH', 'auto').lower()
+    # Must match the server's innodb_ft_min_token_size; shorter words are not required to match
+    app.config['FULLTEXT_MIN_TOKEN_SIZE'] = int(os.environ.get('FULLTEXT_MIN_TOKEN_SIZE', 3))
+    app.config['TEXT_INDEX_TTL'] = float(os.environ.get('TEXT_INDEX_TTL', 60))
+    # Per-worker cache of listing total/facet counts (seconds). A TTL of 0 disables it.
+    app.config['COUNT_CACHE_TTL'] = float(os.environ.get('COUNT_CACHE_TTL', 10))
+    # max-age of the Cache-Control: public header on anonymous food reads (seconds)
+    app.config['HTTP_CACHE_MAX_AGE'] = int(os.environ.get('HTTP_CACHE_MAX_AGE', 0))
+    # Registers /internal/pool; only enable where that path is not publicly reachable
+    app.config['INTERNAL_ENDPOINTS'] = os.environ.get('INTERNAL_ENDPOINTS', 'false').lower() == 'true'
+    # Registers /metrics (needs prometheus_client); set PROMETHEUS_MULTIPROC_DIR with several workers
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    # Adds an X-Query-Count header with the number of SQL statements each request issued
+    app.config['QUERY_COUNT_HEADER'] = os.environ.get('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+    # Adds a Server-Timing header splitting each request's time into DB and the rest
+    app.config['SERVER_TIMING_HEADER'] = os.environ.get('SERVER_TIMING_HEADER', 'false').lower() == 'true'
+    # Log requests slower than SLOW_REQUEST_MS or with a statement slower than SLOW_QUERY_MS. 0 disables either.
+    app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 250))
+
     if os.environ.get('FLASK_ENV') == 'development':
         app.config.update(
             SESSION_COOKIE_SAMESITE='None',
@@ -94,6 +147,15 @@ def create_app() -> Flask:
     app.config['OAUTH_PROVIDERS'] = oauth_providers
 
     db.init_app(app)
+    cache_init_app(app)
+    instrumentation_init_app(app)
+    food_changes_init_app(app)
+    restriction_index_init_app(app)
+    text_search_init_app(app)
+    counts_init_app(app)
+    pool_init_app(app)
+    replicas_init_app(app)
+    metrics_init_app(app)
     auth_init_app(app)
 
     from allergy_snatcher.routes.endpoints import routes
@@ -115,12 +177,42 @@ def create_app() -> Flask:
         return app.send_static_file('index.html')
 
     with app.app_context():
-        db.create_all()
+        # Only the primary; replica binds have no tables of their own
+        db.create_all(bind_key=None)
         _ensure_admin_account(app)
 
     return app
 
 
+def _engine_options(database_url: str) -> dict:
+    """
+    Connection pool settings of each worker, from the environment:
+        DB_POOL_SIZE, DB_MAX_OVERFLOW    connections kept open / allowed on top under load
+        DB_POOL_TIMEOUT                  seconds to wait for a free connection
+        DB_POOL_RECYCLE                  seconds after which a connection is replaced; keep
+                                         it below MySQL's wait_timeout
+        DB_POOL_PRE_PING                 test connections on checkout and replace dead ones
+        DB_CONNECT_TIMEOUT, DB_READ_TIMEOUT, DB_WRITE_TIMEOUT   PyMySQL socket timeouts
+    They only apply to MySQL; other databases (DATABASE_URL) keep SQLAlchemy's defaults.
+    """
+    if not database_url.startswith('mysql'):
+        return {}
+
+    connect_args = {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10))}
+    for name in ('read_timeout', 'write_timeout'):
+        value = os.environ.get(f'DB_{name.upper()}')
+        if value:
+            connect_args[name] = int(value)
+
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'connect_args': connect_args,
+    }
+
 def _ensure_admin_account(app: Flask) -> None:
     """
     Creates a default admin user if it does not exist.
@@ -0,0 +1,209 @@
+"""
+Allergen inference from ingredient text.
+
+Ingredient strings are matched against a synonym dictionary with a single
+token-level Aho-Corasick automaton, compiled once at import: every ingredient
+is scanned in one pass no matter how many synonyms there are, and terms nested
+in parentheses ("ENRICHED FLOUR (WHEAT FLOUR, NIACIN)") are found like any
+other. Overlapping matches resolve to the leftmost longest one, so phrases
+such as "cocoa butter" or "gluten free" can override the words they contain.
+
+Detected allergens are reported by dietary restriction name, in the sense the
+catalog uses them ("Gluten" = contains gluten). This module has no Flask or
+database dependencies so dataimport.py can use it too.
+"""
+
+from __future__ import annotations
+import re
+from collections import deque
+from typing import Iterable, Mapping, NamedTuple
+
+class Allergen(NamedTuple):
+    names: tuple[str, ...]  # dietary restriction names meaning "contains this", first is canonical
+    terms: tuple[str, ...]  # ingredient words or phrases; a plural "s" is matched too
+
+ALLERGENS = (
+    Allergen(("Gluten", "Wheat"), (
+        "wheat", "gluten", "barley", "rye", "malt", "spelt", "semolina", "durum", "farina",
+        "bulgur", "couscous", "seitan", "triticale", "kamut", "graham", "enriched flour",
+        "bleached flour", "all purpose flour", "bread crumb", "breadcrumb", "panko",
+    )),
+    Allergen(("Dairy", "Milk"), (
+        "milk", "cream", "butter", "buttermilk", "cheese", "whey", "casein", "caseinate",
+        "yogurt", "yoghurt", "ghee", "curd", "kefir", "lactose", "milkfat", "milk fat",
+    )),
+    Allergen(("Lactose",), (
+        "milk", "cream", "buttermilk", "whey", "yogurt", "yoghurt", "lactose", "milkfat",
+        "milk fat", "cheese",
+    )),
+    Allergen(("Eggs", "Egg"), (
+        "egg", "egg white", "egg yolk", "albumin", "albumen", "ovalbumin", "lysozyme",
+        "mayonnaise", "meringue",
+    )),
+    Allergen(("Nuts", "Tree Nuts", "Peanuts"), (
+        "nut", "peanut", "almond", "walnut", "pecan", "cashew", "pistachio", "hazelnut",
+        "filbert", "macadamia", "brazil nut", "pine nut", "praline", "marzipan",
+    )),
+    Allergen(("Soy", "Soya"), (
+        "soy", "soya", "soybean", "soy lecithin", "tofu", "edamame", "miso", "tempeh", "tamari",
+    )),
+    Allergen(("Shellfish",), (
+        "shrimp", "prawn", "crab", "lobster", "crawfish", "crayfish", "clam", "mussel",
+        "oyster", "scallop", "langoustine",
+    )),
+    Allergen(("Fish",), (
+        "fish", "anchovy", "anchovies", "cod", "salmon", "tuna", "tilapia", "sardine", "pollock",
+    )),
+    Allergen(("Sesame",), ("sesame", "tahini")),
+    Allergen(("Pork",), (
+        "pork", "bacon", "ham", "lard", "prosciutto", "pancetta", "salami", "pepperoni", "chorizo",
+    )),
+    Allergen(("Red meat",), (
+        "beef", "veal", "lamb", "mutton", "venison", "bison", "goat", "pork", "bacon", "ham",
+        "lard", "prosciutto", "pancetta", "salami", "pepperoni", "chorizo",
+    )),
+)
+
+# Phrases that contain a dictionary term but mean something else, with the
+# allergens they do imply (by canonical name)
+OVERRIDES: dict[str, tuple[str, ...]] = {
+    "cocoa butter": (), "shea butter": (), "cream of tartar": (), "coconut milk": (),
+    "coconut cream": (), "oat milk": (), "rice milk": (), "water chestnut": (),
+    "butternut": (), "peanut butter": ("Nuts",), "almond milk": ("Nuts",),
+    "almond butter": ("Nuts",), "cashew milk": ("Nuts",), "soy milk": ("Soy",),
+    "nut milk": ("Nuts",), "buckwheat": (), "malt vinegar": ("Gluten",),
+    "gluten free": (), "wheat free": (), "dairy free": (), "milk free": (),
+    "lactose free": (), "egg free": (), "nut free": (), "peanut free": (),
+    "soy free": (), "non dairy": (),
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+def _variants(term: str) -> tuple[tuple[str, ...], ...]:
+    """
+    Token sequences of a term as written and with a plural last word.
+    """
+    tokens = tuple(tokenize(term))
+    return tokens, tokens[:-1] + (tokens[-1] + 's',)
+
+
+class AllergenMatcher:
+    """
+    Token-level Aho-Corasick automaton mapping phrases to allergen names.
+    """
+
+    def __init__(self, patterns: Mapping[tuple[str, ...], frozenset[str]]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Patterns ending at each state as (length in tokens, allergen names)
+        self._out: list[tuple[tuple[int, frozenset[str]], ...]] = [()]
+
+        for tokens, names in patterns.items():
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = ((len(tokens), names),)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(token, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+                queue.append(next_state)
+
+    @classmethod
+    def from_dictionary(
+        cls,
+        allergens: Iterable[Allergen],
+        overrides: Mapping[str, Iterable[str]],
+    ) -> AllergenMatcher:
+        patterns: dict[tuple[str, ...], set[str]] = {}
+        for allergen in allergens:
+            for term in allergen.terms:
+                for variant in _variants(term):
+                    patterns.setdefault(variant, set()).add(allergen.names[0])
+        for phrase, names in overrides.items():
+            for variant in _variants(phrase):
+                patterns[variant] = set(names)
+        return cls({tokens: frozenset(names) for tokens, names in patterns.items()})
+
+    def scan(self, text: str) -> set[str]:
+        """
+        Canonical names of the allergens found in one ingredient string.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for end, token in enumerate(tokenize(text), 1):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length, names in out[state]:
+                matches.append((end - length, -length, names))
+
+        found: set[str] = set()
+        covered = 0
+        for start, neg_length, names in sorted(matches, key=lambda match: match[:2]):
+            if start >= covered:
+                found |= names
+                covered = start - neg_length
+        return found
+
+    def detect(self, ingredients: Iterable[str]) -> set[str]:
+        found: set[str] = set()
+        for ingredient in ingredients:
+            found |= self.scan(ingredient)
+        return found
+
+
+matcher = AllergenMatcher.from_dictionary(ALLERGENS, OVERRIDES)
+
+# Lowercased dietary restriction name -> canonical allergen name
+_ALIASES = {name.lower(): allergen.names[0] for allergen in ALLERGENS for name in allergen.names}
+
+def detect_allergens(ingredients: Iterable[str]) -> set[str]:
+    """
+    Canonical names of the allergens found in a food's ingredient strings.
+    """
+    return matcher.detect(ingredients)
+
+def missing_allergens(ingredients: Iterable[str], restriction_names: Iterable[str]) -> set[str]:
+    """
+    Canonical names of the allergens found in the ingredients that none of
+    `restriction_names` (or their aliases) already covers.
+    """
+    tagged = {_ALIASES.get(name.lower()) for name in restriction_names}
+    return detect_allergens(ingredients) - tagged
+
+def suggest_restriction_ids(
+    ingredients: Iterable[str],
+    restriction_by_name: Mapping[str, int],
+    current_ids: Iterable[int] = (),
+) -> list[int]:
+    """
+    Ids of the dietary restrictions the ingredients imply but `current_ids`
+    lacks. `restriction_by_name` maps restriction names to ids; names that don't
+    correspond to a known allergen are ignored.
+    """
+    detected = detect_allergens(ingredients)
+    if not detected:
+        return []
+    current = set(current_ids)
+    return sorted({
+        restriction_id for name, restriction_id in restriction_by_name.items()
+        if _ALIASES.get(name.lower()) in detected and restriction_id not in current
+    })
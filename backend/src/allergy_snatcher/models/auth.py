@@ -1,17 +1,119 @@
 from functools import wraps
+from typing import Any, NamedTuple
 from flask import request, g, jsonify
-from .database import UserSession, User
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, contains_eager, make_transient_to_detached, object_session
+from .database import db, UserSession, User
+from .cache import session_cache, token_key
+from .replicas import primary
 import datetime
 
 def _utc_now():
     return datetime.datetime.now(datetime.timezone.utc)
 
+def _as_utc(dt: datetime.datetime) -> datetime.datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
 def _is_active(expires_at: datetime.datetime | None) -> bool:
     if not expires_at:
         return False
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
-    return expires_at > _utc_now()
+    return _as_utc(expires_at) > _utc_now()
+
+class _CachedSession(NamedTuple):
+    user_id: int
+    session: dict[str, Any]
+    user: dict[str, Any]
+
+def _snapshot(obj) -> dict[str, Any]:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+def _attach(model, values: dict[str, Any]):
+    """
+    Rebuilds a cached row as a persistent instance of the current
+    db session without emitting a query.
+    """
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+def resolve_session(session_token: str) -> tuple[UserSession | None, User | None]:
+    """
+    Resolves a session token to its session and owning user (including role)
+    with a single joined SELECT, serving active sessions from the session
+    cache when possible. Expiry is left for the caller to check.
+    """
+    key = token_key(session_token)
+    cached = session_cache.get(key)
+    if cached is not None:
+        return _attach(UserSession, cached.session), _attach(User, cached.user)
+
+    # Read from the primary even in @read_only requests: the result is cached, and a
+    # lagging replica could still show a revoked session or a user's old role
+    with primary():
+        user_session = db.session.scalars(
+            select(UserSession)
+            .outerjoin(UserSession.user)
+            .options(contains_eager(UserSession.user))
+            .where(UserSession.session_token == session_token)
+        ).first()
+    if not user_session:
+        return None, None
+
+    user = user_session.user
+    if user and _is_active(user_session.expires_at):
+        # Never keep an entry past the session's own expiry
+        session_cache.set(
+            key,
+            _CachedSession(user.id, _snapshot(user_session), _snapshot(user)),
+            ttl=(_as_utc(user_session.expires_at) - _utc_now()).total_seconds()
+        )
+    return user_session, user
+
+_REVOKED_TOKENS_KEY = 'revoked_session_tokens'
+_ROLE_CHANGES_KEY = 'role_changed_user_ids'
+
+def invalidate_session(session_token: str | None) -> None:
+    """
+    Drops a session token from the session cache once the current transaction
+    commits. Call whenever the token is deleted or rotated. Dropping it right
+    away would let a concurrent request cache the session again before the
+    deletion or rotation is committed.
+    """
+    if session_token:
+        db.session.info.setdefault(_REVOKED_TOKENS_KEY, set()).add(session_token)
+
+def invalidate_user_sessions(user_id: int) -> None:
+    """
+    Drops every cached session belonging to a user.
+    """
+    session_cache.pop_where(lambda entry: entry.user_id == user_id)
+
+@event.listens_for(User.role, 'set')
+def _invalidate_on_role_change(target, value, oldvalue, initiator):
+    # A changed role (including 'disabled') must be seen by the next request. The
+    # cached sessions are dropped once the change is committed; dropping them now
+    # would let a concurrent request cache the old role again before the commit.
+    if not inspect(target).has_identity or value == oldvalue:
+        return
+    session = object_session(target)
+    if session is None:
+        invalidate_user_sessions(target.id)
+    else:
+        session.info.setdefault(_ROLE_CHANGES_KEY, set()).add(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_session_changes(session):
+    for session_token in session.info.pop(_REVOKED_TOKENS_KEY, ()):
+        session_cache.pop(token_key(session_token))
+    for user_id in session.info.pop(_ROLE_CHANGES_KEY, ()):
+        invalidate_user_sessions(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_session_changes(session):
+    session.info.pop(_REVOKED_TOKENS_KEY, None)
+    session.info.pop(_ROLE_CHANGES_KEY, None)
 
 def require_session(f):
     @wraps(f)
@@ -21,7 +123,7 @@ def require_session(f):
         if not session_token:
             return jsonify({"error": "Missing session token"}), 401
 
-        user_session = UserSession.query.filter_by(session_token=session_token).first()
+        user_session, user = resolve_session(session_token)
         if not user_session:
             return jsonify({"error": "Invalid session token"}), 401
 
@@ -30,7 +132,6 @@ def require_session(f):
             # Log the user out, or if refresh oauth token is available, try to renew the session token
             return jsonify({"error": "Session expired"}), 401
             
-        user = User.query.get(user_session.user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
         if user.role == 'disabled':
@@ -69,10 +170,9 @@ def optional_session(f):
         session_token = request.cookies.get('session_token')
 
         if session_token:
-            user_session = UserSession.query.filter_by(session_token=session_token).first()
+            user_session, user = resolve_session(session_token)
             
             if user_session and _is_active(user_session.expires_at):
-                user = User.query.get(user_session.user_id)
                 if user and user.role != 'disabled':
                     g.user = user
                     g.session = user_session
@@ -0,0 +1,163 @@
+"""
+In-process caches shared by the request decorators and routes.
+
+Every gunicorn worker holds its own copy of these caches, so entries are kept
+short-lived: the TTL bounds how long a change made through another worker can
+go unnoticed by this one.
+"""
+
+from __future__ import annotations
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Hashable
+from flask import Flask
+
+class TTLCache:
+    """
+    A bounded, thread-safe LRU mapping whose entries expire after a TTL.
+    A TTL of 0 disables the cache (nothing is ever stored).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        Stores a value. A per-entry ttl can only shorten the cache-wide TTL.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Removes every entry whose value matches the predicate.
+        Returns the number of removed entries.
+        """
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class VersionedCache:
+    """
+    A TTL cache of computed values with a version counter per key.
+    invalidate() bumps the key's version, so a value that was being computed
+    from pre-change data when the invalidation happened is never stored.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self._cache = TTLCache(maxsize=64, ttl=ttl)
+        self._versions: defaultdict[Hashable, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> float:
+        return self._cache.ttl
+
+    @ttl.setter
+    def ttl(self, value: float) -> None:
+        self._cache.ttl = value
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+        version = self._versions[key]
+        value = loader()
+        with self._lock:
+            if self._versions[key] == version:
+                self._cache.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._versions[key] += 1
+            self._cache.pop(key)
+
+    def version(self, key: Hashable) -> int:
+        return self._versions[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._versions):
+                self._versions[key] += 1
+            self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+
+def token_key(token: str) -> str:
+    """
+    Cache key for a session token. Only the digest is kept in memory.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# Resolved sessions, keyed by token_key(session_token). See models/auth.py.
+# Invalidation (logout, refresh, role changes) is local to the worker: elsewhere a
+# revoked token stays usable until its entry expires (SESSION_CACHE_TTL).
+session_cache = TTLCache()
+
+# Serialized payloads of the lookup tables (categories, cuisines, dietary restrictions),
+# keyed by table name, and their validation indexes, keyed by ('index', table name).
+# Invalidated by the admin create/delete endpoints, see models/lookups.py.
+lookup_cache = VersionedCache()
+
+
+def init_app(app: Flask) -> None:
+    session_cache.ttl = app.config.get('SESSION_CACHE_TTL', 30)
+    session_cache.maxsize = app.config.get('SESSION_CACHE_SIZE', 1024)
+    session_cache.clear()
+    lookup_cache.ttl = app.config.get('LOOKUP_CACHE_TTL', 300)
+    lookup_cache.clear()
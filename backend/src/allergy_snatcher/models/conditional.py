@@ -0,0 +1,96 @@
+"""
+HTTP conditional requests for the food read routes.
+
+A single food's ETag is derived from its updated_at and a listing's from the
+catalog_version counter, both maintained in the database by
+models/food_changes.py, so every worker hands out and accepts the same tags.
+The catalog version is part of a single food's tag as well, since updated_at
+only has one second resolution. Requests whose If-None-Match (or
+If-Modified-Since) still matches get an empty 304 before the payload is built.
+
+Responses to anonymous users only ever contain public foods and are marked
+Cache-Control: public so a CDN or reverse proxy may serve them; everyone
+else's are private. Either way clients must revalidate once max-age expires.
+"""
+
+from __future__ import annotations
+import datetime
+import hashlib
+from functools import wraps
+from flask import current_app, g, request
+from sqlalchemy import select
+from .database import db, CatalogVersion
+
+def catalog_version_query():
+    """
+    Scalar subquery of the catalog version (0 before the first change).
+    """
+    return select(CatalogVersion.version).where(CatalogVersion.id == 1).scalar_subquery()
+
+def catalog_state() -> tuple[int, datetime.datetime | None]:
+    """
+    Returns (catalog version, time of the last change).
+    """
+    row = db.session.execute(
+        select(CatalogVersion.version, CatalogVersion.updated_at).where(CatalogVersion.id == 1)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+def _scope() -> str:
+    return f"{g.user.role}:{g.user.id}" if g.get('user') else "public"
+
+def make_etag(*parts) -> str:
+    """
+    An ETag for the given state parts, the visibility scope and the request URL.
+    """
+    key = "|".join(str(part) for part in (*parts, _scope(), request.full_path))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def not_modified(etag: str, last_modified: datetime.datetime | None) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _http_time(last_modified) <= request.if_modified_since
+    return False
+
+def _http_time(value: datetime.datetime) -> datetime.datetime:
+    # Naive timestamps come back from MySQL DATETIME columns in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.replace(microsecond=0)
+
+def with_cache_headers(response, etag: str, last_modified: datetime.datetime | None):
+    """
+    Adds the validators and Cache-Control to a response (200 or 304).
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_time(last_modified)
+    max_age = current_app.config.get('HTTP_CACHE_MAX_AGE', 0)
+    if g.get('user'):
+        response.headers['Cache-Control'] = 'private, no-cache'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, must-revalidate'
+    response.vary.add('Cookie')
+    return response
+
+def not_modified_response(etag: str, last_modified: datetime.datetime | None):
+    return with_cache_headers(current_app.response_class(status=304), etag, last_modified)
+
+def conditional_listing(f):
+    """
+    Answers a listing route with 304 while the catalog has not changed since
+    the client's copy, and tags its 200 responses. Apply below the session
+    decorator so the visibility scope is known.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version, changed_at = catalog_state()
+        etag = make_etag("catalog", version)
+        if not_modified(etag, changed_at):
+            return not_modified_response(etag, changed_at)
+        response = current_app.make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            with_cache_headers(response, etag, changed_at)
+        return response
+    return decorated_function
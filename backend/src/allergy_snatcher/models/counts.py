@@ -0,0 +1,81 @@
+"""
+Total and facet counts of food listings.
+
+A listing can report how many foods match it and how they spread over
+categories, cuisines and dietary restrictions, so the frontend can render
+pagers and filter chips. Each count is a single COUNT or grouped COUNT over
+the listing's filtered query.
+
+Counts are cached per worker for a few seconds, keyed by the compiled SQL and
+its parameters. The visibility scope is part of those filters, so every
+anonymous user shares the public entries while a contributor's or admin's
+scope (which depends on their user id) gets its own. Food changes committed
+through this worker clear the cache (see models/food_changes.py).
+"""
+
+from __future__ import annotations
+from typing import Any, Hashable
+from flask import Flask
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from . import food_changes
+from .cache import TTLCache
+from .database import Food, DietRestrictAssoc
+
+count_cache = TTLCache(maxsize=512, ttl=10.0)
+
+def _cache_key(query, kind: str) -> Hashable:
+    compiled = query.statement.compile()
+    return kind, str(compiled), tuple(sorted((name, repr(value)) for name, value in compiled.params.items()))
+
+def _cached(query, kind: str, loader) -> Any:
+    key = _cache_key(query, kind)
+    value = count_cache.get(key)
+    if value is None:
+        value = loader()
+        count_cache.set(key, value)
+    return value
+
+def _grouped(query, column) -> list[dict[str, int]]:
+    rows = (
+        query.with_entities(column, func.count(Food.id))
+        .filter(column.isnot(None))
+        .group_by(column)
+        .order_by(column)
+    )
+    return [{"id": row_id, "count": count} for row_id, count in rows]
+
+def total_count(query) -> int:
+    """
+    Number of foods matched by a filtered Food query.
+    """
+    query = query.order_by(None)
+    return _cached(query, 'total', lambda: query.with_entities(func.count(Food.id)).scalar())
+
+def facet_counts(query) -> dict[str, list[dict[str, int]]]:
+    """
+    Foods matched by a filtered Food query per category, cuisine and dietary
+    restriction, as {"categories": [{"id": 1, "count": 12}, ...], ...}.
+    """
+    query = query.order_by(None)
+
+    def load() -> dict[str, list[dict[str, int]]]:
+        assoc = aliased(DietRestrictAssoc)
+        return {
+            "categories": _grouped(query, Food.category_id),
+            "cuisines": _grouped(query, Food.cuisine_id),
+            "dietary_restrictions": _grouped(
+                query.join(assoc, assoc.food_id == Food.id), assoc.restriction_id
+            ),
+        }
+    return _cached(query, 'facets', load)
+
+
+def _clear(food_ids: set[int]) -> None:
+    count_cache.clear()
+
+food_changes.subscribe(_clear)
+
+def init_app(app: Flask) -> None:
+    count_cache.ttl = app.config.get('COUNT_CACHE_TTL', 10)
+    count_cache.clear()
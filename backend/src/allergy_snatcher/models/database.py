@@ -8,11 +8,12 @@ from __future__ import annotations
 import datetime
 from typing import List, Literal
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Integer, String, DateTime, ForeignKey, UniqueConstraint, func, Float, Text
-from sqlalchemy.dialects.mysql import ENUM
+from sqlalchemy import Integer, String, DateTime, ForeignKey, UniqueConstraint, Index, Enum, func, Float, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from .replicas import RoutingSession
 
-db = SQLAlchemy()
+# Reads of @read_only handlers may go to a replica, see models/replicas.py
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class Base(db.Model):
     __abstract__ = True
@@ -33,7 +34,7 @@ class User(Base):
     # User's primary email address. Also unique.
     email: Mapped[str] = mapped_column(String(255), unique=True, nullable=False, index=True)
     
-    role: Mapped[Literal["admin","user","disabled"]] = mapped_column(ENUM("admin","user","disabled"), nullable=False, default="user")
+    role: Mapped[Literal["admin","user","disabled"]] = mapped_column(Enum("admin","user","disabled"), nullable=False, default="user")
     first_name: Mapped[str] = mapped_column(String(100), nullable=True)
     last_name: Mapped[str] = mapped_column(String(100), nullable=True)
 
@@ -209,6 +210,18 @@ class Food(Base):
     Main table for food items and their nutritional information.
     """
     __tablename__ = "foods"
+
+    __table_args__ = (
+        # Full-text search over names, see models/text_search.py (MySQL only)
+        Index("ft_food_name", "name", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        # Listing visibility filters (publication_status, owner) combined with the
+        # listing order, see _filter_visible in routes/endpoints.py
+        Index("ix_foods_status_name", "publication_status", "name", "id"),
+        Index("ix_foods_status_id", "publication_status", "id"),
+        Index("ix_foods_category_status_name", "category_id", "publication_status", "name", "id"),
+        Index("ix_foods_cuisine_status_name", "cuisine_id", "publication_status", "name", "id"),
+        Index("ix_foods_user_status", "user_id", "publication_status"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
@@ -218,7 +231,7 @@ class Food(Base):
     # - 'private': Contributor is not ready to share; visible only to admins and the contributor.
     # - 'unlisting': Contributor has requested publication; pending admin review.
     publication_status: Mapped[Literal["public", "private", "unlisting"]] = mapped_column(
-        ENUM("public", "private", "unlisting"), default="private", nullable=False
+        Enum("public", "private", "unlisting"), default="private", nullable=False
     )
     
     # Nutritional info
@@ -234,6 +247,11 @@ class Food(Base):
     sat_fats: Mapped[float] = mapped_column(Float, nullable=True)
     serving_amt: Mapped[float] = mapped_column(Float, nullable=True)
     serving_unit: Mapped[str] = mapped_column(String(50), nullable=True)
+
+    # Also bumped when the ingredients or restrictions change, see models/food_changes.py
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
     
     # --- Foreign Keys & Relationships ---
     
@@ -268,6 +286,11 @@ class Ingredient(Base):
     so we model the natural key (food_id + ingredient_name).
     """
     __tablename__ = "ingredients"
+
+    __table_args__ = (
+        # Full-text search over ingredient text, see models/text_search.py (MySQL only)
+        Index("ft_ingredient_name", "ingredient_name", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
     
     food_id: Mapped[int] = mapped_column(ForeignKey("foods.id"), nullable=False, primary_key=True)
     food: Mapped[Food] = relationship(back_populates="ingredients")
@@ -284,6 +307,11 @@ class DietRestrictAssoc(Base):
     between Food and DietaryRestriction.
     """
     __tablename__ = "diet_restrict_assoc"
+
+    __table_args__ = (
+        # Listing foods by restriction
+        Index("ix_diet_restrict_assoc_restriction", "restriction_id", "food_id"),
+    )
     
     # Composite primary key
     food_id: Mapped[int] = mapped_column(ForeignKey("foods.id"), primary_key=True)
@@ -294,3 +322,20 @@ class DietRestrictAssoc(Base):
 
     def __repr__(self) -> str:
         return f"<DietRestrictAssoc(food_id={self.food_id!r}, restriction_id={self.restriction_id!r})>"
+
+
+class CatalogVersion(Base):
+    """
+    Single-row counter bumped by every transaction that changes foods, so all
+    workers agree on the ETag of a listing. See models/food_changes.py.
+    """
+    __tablename__ = "catalog_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self) -> str:
+        return f"<CatalogVersion(version={self.version!r})>"
@@ -0,0 +1,98 @@
+"""
+Tracks which foods each transaction touched, so the in-memory food indexes can
+refresh just those foods once the transaction commits.
+
+Flushes that add, change or delete Food, Ingredient or DietRestrictAssoc rows
+are collected per session; on commit every subscriber is called with the set
+of affected food ids, and on rollback the set is dropped. Statements that
+bypass the ORM unit of work (bulk UPDATE/DELETE) must call notify() themselves.
+
+Within the flushing transaction the affected foods also get a fresh
+updated_at. After the commit the catalog_version row is bumped in a short
+transaction of its own, once per committed transaction, so every worker
+derives the same ETags (see models/conditional.py). Bumping it inside the
+writing transaction would hold the row lock of that single row until commit
+and queue every food write of every worker behind it. Bulk statements call
+touch() before committing.
+"""
+
+from __future__ import annotations
+from typing import Callable, Iterable
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, func, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from .database import db, CatalogVersion, Food, Ingredient, DietRestrictAssoc
+
+_subscribers: list[Callable[[set[int]], None]] = []
+_CHANGES_KEY = 'changed_food_ids'
+_BUMP_KEY = 'catalog_version_bump'
+
+def subscribe(callback: Callable[[set[int]], None]) -> None:
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+
+def notify(food_ids: Iterable[int]) -> None:
+    """
+    Reports foods changed outside the ORM unit of work to every subscriber.
+    """
+    food_ids = set(food_ids)
+    if food_ids:
+        for callback in _subscribers:
+            callback(food_ids)
+
+def touch(session: Session, food_ids: Iterable[int]) -> None:
+    """
+    Stamps updated_at of the foods in the session's current transaction and
+    schedules a catalog version bump for when it commits.
+    """
+    food_ids = set(food_ids)
+    if not food_ids:
+        return
+    session.connection().execute(update(Food).where(Food.id.in_(food_ids)).values(updated_at=func.now()))
+    session.info[_BUMP_KEY] = True
+
+def _bump_catalog_version() -> None:
+    """
+    Increments the catalog version in its own transaction on the primary.
+    """
+    try:
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                update(CatalogVersion).where(CatalogVersion.id == 1)
+                .values(version=CatalogVersion.version + 1, updated_at=func.now())
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(CatalogVersion).values(id=1, version=1))
+    except SQLAlchemyError as error:
+        # The foods are committed already; listings keep their old ETag until the next change
+        if has_app_context():
+            current_app.logger.warning(f"Could not bump the catalog version: {error}")
+
+def _collect_changes(session: Session, flush_context) -> None:
+    flushed: set[int] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Food) and obj.id is not None:
+            flushed.add(obj.id)
+        elif isinstance(obj, (Ingredient, DietRestrictAssoc)) and obj.food_id is not None:
+            flushed.add(obj.food_id)
+    session.info.setdefault(_CHANGES_KEY, set()).update(flushed)
+    touch(session, flushed)
+
+def _apply_changes(session: Session) -> None:
+    if session.info.pop(_BUMP_KEY, False):
+        _bump_catalog_version()
+    notify(session.info.pop(_CHANGES_KEY, ()))
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_BUMP_KEY, None)
+    session.info.pop(_CHANGES_KEY, None)
+
+def init_app(app: Flask) -> None:
+    for name, listener in (
+        ('after_flush', _collect_changes),
+        ('after_commit', _apply_changes),
+        ('after_rollback', _discard_changes),
+    ):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
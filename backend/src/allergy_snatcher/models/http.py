@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, field_validator, model_validator, ValidationInfo
+from pydantic import BaseModel, Field, TypeAdapter, field_validator, model_validator, ValidationInfo
 from typing import List, Optional, Literal
-from .database import DietaryRestriction, Category, Cuisine
+from .lookups import has_id, resolve_name
 
 # --- Category Schemas ---
 
@@ -116,6 +116,11 @@ class FoodListSchema(BaseModel):
     """
     foods: List[FoodSchema]
 
+# Validates and serializes a whole page of foods in one call, straight to JSON bytes
+FoodListAdapter = TypeAdapter(List[FoodSchema])
+# Serializes one food at a time, for streamed exports
+FoodAdapter = TypeAdapter(FoodSchema)
+
 
 class CreateIngredientSchema(BaseModel):
     """
@@ -130,21 +135,22 @@ class FoodValidatorModel(BaseModel):
         if not v or v == '[]':
             return v
         
-        restrictions = DietaryRestriction.query.all()
-        valid_ids = {r.id for r in restrictions}
-        valid_names = {r.restriction for r in restrictions}
-
+        # Names are resolved to ids so callers can store the result directly
+        resolved = []
         for sel in v:
             if isinstance(sel, str):
-                if sel not in valid_names:
+                restriction_id = resolve_name('dietary_restrictions', sel)
+                if restriction_id is None:
                     raise ValueError(f"Invalid dietary restriction: {sel}")
+                resolved.append(restriction_id)
             elif isinstance(sel, int):
-                if sel not in valid_ids:
+                if not has_id('dietary_restrictions', sel):
                     raise ValueError(f"Invalid dietary restriction ID: {sel}")
+                resolved.append(sel)
             else:
                 raise ValueError(f"Invalid dietary restriction ID: {sel}")
             
-        return v
+        return resolved
     
     @model_validator(mode='before')
     @classmethod
@@ -169,7 +175,7 @@ class FoodValidatorModel(BaseModel):
     def validate_category_id(cls, v):
         if v is None:
             return v
-        if not Category.query.get(v):
+        if not has_id('categories', v):
             raise ValueError(f"Invalid category ID: {v}")
         return v
 
@@ -178,7 +184,7 @@ class FoodValidatorModel(BaseModel):
     def validate_cuisine_id(cls, v):
         if v is None:
             return v
-        if not Cuisine.query.get(v):
+        if not has_id('cuisines', v):
             raise ValueError(f"Invalid cuisine ID: {v}")
         return v
     
@@ -241,3 +247,10 @@ Schema for updating a food item.
     cuisine_id: Optional[int] = None
     ingredients: Optional[List[CreateIngredientSchema]] = None
     dietary_restriction_ids: Optional[List[int|str]] = None
+
+class ModerateFoodsSchema(BaseModel):
+    """
+    Schema for approving or rejecting pending foods in bulk.
+    """
+    action: Literal['approve', 'reject']
+    food_ids: List[int] = Field(min_length=1, max_length=5000)
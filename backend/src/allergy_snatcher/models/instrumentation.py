@@ -0,0 +1,112 @@
+"""
+Per-request database instrumentation.
+
+Counts the SQL statements issued while handling a request so query budgets
+(e.g. one query to resolve a session) can be checked from the outside, and
+times them: every request accumulates its total DB time and remembers its
+slowest statement.
+
+Requests slower than SLOW_REQUEST_MS, or with a statement slower than
+SLOW_QUERY_MS, are logged as a warning with those figures. With
+SERVER_TIMING_HEADER set, responses carry a Server-Timing header splitting the
+time until the response was built into "db" (SQL statements) and "app"
+(everything else: routing, validation, serialization), which browser devtools
+show in the request's timing tab. Streamed bodies (e.g. exports) are produced
+after that point and are not included.
+"""
+
+from __future__ import annotations
+import time
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Longest statement text written to the slow request log
+MAX_LOGGED_STATEMENT = 500
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None or not has_request_context():
+        return
+    elapsed = time.perf_counter() - started
+    g.db_time = g.get('db_time', 0.0) + elapsed
+    if elapsed > g.get('slowest_query', (0.0, None))[0]:
+        g.slowest_query = (elapsed, statement)
+
+def query_count() -> int:
+    """
+    Number of SQL statements executed so far in the current request.
+    """
+    return g.get('query_count', 0)
+
+def db_time() -> float:
+    """
+    Seconds spent in SQL statements so far in the current request.
+    """
+    return g.get('db_time', 0.0)
+
+def slowest_query() -> tuple[float, str | None]:
+    """
+    (seconds, statement) of the slowest SQL statement of the current request.
+    """
+    return g.get('slowest_query', (0.0, None))
+
+def request_time() -> float:
+    """
+    Seconds since the current request started.
+    """
+    return time.perf_counter() - g.get('request_started', time.perf_counter())
+
+def _log_slow_request(total: float) -> None:
+    slowest, statement = slowest_query()
+    slow_request_ms = current_app.config.get('SLOW_REQUEST_MS', 0)
+    slow_query_ms = current_app.config.get('SLOW_QUERY_MS', 0)
+    if not (
+        (slow_request_ms and total * 1000 >= slow_request_ms)
+        or (slow_query_ms and slowest * 1000 >= slow_query_ms)
+    ):
+        return
+    statement = " ".join((statement or "").split())
+    if len(statement) > MAX_LOGGED_STATEMENT:
+        statement = statement[:MAX_LOGGED_STATEMENT] + "..."
+    current_app.logger.warning(
+        f"Slow request {request.method} {request.full_path.rstrip('?')}: {total * 1000:.1f} ms, "
+        f"{query_count()} queries, {db_time() * 1000:.1f} ms in DB, "
+        f"slowest {slowest * 1000:.1f} ms: {statement}"
+    )
+
+def init_app(app: Flask) -> None:
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+    if not event.contains(Engine, 'after_cursor_execute', _time_query):
+        event.listen(Engine, 'after_cursor_execute', _time_query)
+
+    @app.before_request
+    def start_request_timer() -> None:
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def add_query_count_header(response: Response) -> Response:
+        if app.config.get('QUERY_COUNT_HEADER'):
+            response.headers['X-Query-Count'] = str(query_count())
+        return response
+
+    @app.after_request
+    def add_server_timing(response: Response) -> Response:
+        total = request_time()
+        if app.config.get('SERVER_TIMING_HEADER'):
+            database = db_time()
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={database * 1000:.1f};desc="{query_count()} queries", '
+                f'app;dur={max(total - database, 0.0) * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        _log_slow_request(total)
+        return response
@@ -0,0 +1,74 @@
+"""
+In-memory index of the lookup tables (categories, cuisines and dietary
+restrictions) so request validation does not have to query them.
+
+The index lives in the lookup cache next to the serialized listings and is
+invalidated together with them. An id or name that is missing from the index
+triggers one reload (per request) before it is rejected, which covers rows
+created through another worker since the index was loaded.
+"""
+
+from __future__ import annotations
+from typing import NamedTuple
+from flask import g, has_request_context
+from sqlalchemy import select
+from .cache import lookup_cache
+from .database import db, Category, Cuisine, DietaryRestriction
+from .replicas import primary
+
+# Lookup table name -> (id column, name column)
+_TABLES = {
+    'categories': (Category.id, Category.category),
+    'cuisines': (Cuisine.id, Cuisine.cuisine),
+    'dietary_restrictions': (DietaryRestriction.id, DietaryRestriction.restriction),
+}
+
+class Lookup(NamedTuple):
+    ids: frozenset[int]
+    names: dict[str, int]
+
+@primary()
+def _load(table: str) -> Lookup:
+    id_col, name_col = _TABLES[table]
+    rows = db.session.execute(select(id_col, name_col)).all()
+    return Lookup(frozenset(row[0] for row in rows), {row[1]: row[0] for row in rows})
+
+def get_lookup(table: str) -> Lookup:
+    return lookup_cache.get_or_load(('index', table), lambda: _load(table))
+
+def _reload(table: str) -> Lookup:
+    # At most once per table and request, so a bulk request full of unknown ids
+    # does not reload the table for every item
+    if has_request_context():
+        reloaded = g.setdefault('reloaded_lookups', set())
+        if table in reloaded:
+            return get_lookup(table)
+        reloaded.add(table)
+    lookup_cache.invalidate(('index', table))
+    return get_lookup(table)
+
+def has_id(table: str, row_id: int | str) -> bool:
+    try:
+        row_id = int(row_id)
+    except (TypeError, ValueError):
+        return False
+    if row_id in get_lookup(table).ids:
+        return True
+    return row_id in _reload(table).ids
+
+def resolve_name(table: str, name: str) -> int | None:
+    """
+    Returns the id of the row with the given name, or None if there is none.
+    """
+    row_id = get_lookup(table).names.get(name)
+    if row_id is None:
+        row_id = _reload(table).names.get(name)
+    return row_id
+
+def invalidate_lookup(table: str) -> None:
+    """
+    Drops the cached listing and index of a lookup table. Call after
+    committing a change to the table.
+    """
+    lookup_cache.invalidate(table)
+    lookup_cache.invalidate(('index', table))
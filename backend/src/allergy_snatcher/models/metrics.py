@@ -0,0 +1,204 @@
+"""
+Prometheus metrics of the app, served at GET /metrics.
+
+Enabled with METRICS_ENABLED=true, which needs the prometheus_client package
+(the "metrics" extra, installed in the Docker image).
+Collected are, per route (the URL rule, e.g. /api/foods/<int:food_id>):
+request counts by status, latency, response size, SQL statements and DB time
+(see models/instrumentation.py). Besides those: hit/miss counts and sizes of
+the per-worker caches, connection pool usage per engine, and login outcomes
+and password hashing times.
+
+Every gunicorn worker keeps its own values. Set PROMETHEUS_MULTIPROC_DIR to an
+empty directory writable by all workers (before the app starts; the
+prometheus_client package reads it on import) so they write them there and
+/metrics sums them up, whichever worker serves the scrape. gunicorn.conf.py
+empties the directory when gunicorn starts and drops dead workers' gauges.
+Without it, /metrics only reports the worker that serves it.
+
+Like the internal endpoints, /metrics has no authentication; keep it off the
+public proxy.
+"""
+
+from __future__ import annotations
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Blueprint, Flask, Response, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .cache import session_cache, lookup_cache
+from .counts import count_cache
+from .database import db
+from . import instrumentation
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, multiprocess
+except ImportError:  # optional dependency, only needed with METRICS_ENABLED
+    prometheus_client = None
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Per-worker caches reported by cache_* metrics
+CACHES = {"session": session_cache, "lookup": lookup_cache, "count": count_cache}
+
+_enabled = False
+
+if prometheus_client is not None:
+    REQUESTS = Counter(
+        'http_requests_total', 'HTTP requests by route, method and status',
+        ['route', 'method', 'status']
+    )
+    REQUEST_SECONDS = Histogram(
+        'http_request_duration_seconds', 'Time until the response was built',
+        ['route', 'method']
+    )
+    RESPONSE_BYTES = Histogram(
+        'http_response_size_bytes', 'Response body size (streamed bodies are not counted)',
+        ['route', 'method'], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+    )
+    REQUEST_QUERIES = Histogram(
+        'http_request_db_queries', 'SQL statements issued per request',
+        ['route', 'method'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+    )
+    REQUEST_DB_SECONDS = Histogram(
+        'http_request_db_seconds', 'Time spent in SQL statements per request',
+        ['route', 'method']
+    )
+    CACHE_LOOKUPS = Counter(
+        'cache_lookups_total', 'Lookups in the per-worker caches', ['cache', 'result']
+    )
+    CACHE_ENTRIES = Gauge(
+        'cache_entries', 'Entries held by the per-worker caches', ['cache'],
+        multiprocess_mode='livesum'
+    )
+    POOL_CHECKED_OUT = Gauge(
+        'db_pool_checked_out', 'Connections currently checked out of the pool', ['engine'],
+        multiprocess_mode='livesum'
+    )
+    POOL_SIZE = Gauge(
+        'db_pool_size', 'Configured pool size (connections kept open)', ['engine'],
+        multiprocess_mode='livesum'
+    )
+    POOL_CONNECTS = Counter(
+        'db_pool_connects_total', 'New database connections opened', ['engine']
+    )
+    POOL_INVALIDATED = Counter(
+        'db_pool_invalidated_total', 'Connections discarded as dead or broken', ['engine']
+    )
+    LOGINS = Counter('auth_logins_total', 'Password logins by outcome', ['result'])
+    PASSWORD_HASH_SECONDS = Histogram(
+        'auth_password_hash_seconds', 'Time to hash or verify a password', ['operation'],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+    )
+
+# Cache hit/miss totals already reported, by cache name
+_reported: dict[str, tuple[int, int]] = {}
+_reported_lock = threading.Lock()
+_watched_pools: set[int] = set()
+
+def _report_caches() -> None:
+    """
+    Adds the cache hits and misses since the last call to the counters.
+    """
+    with _reported_lock:
+        for name, cache in CACHES.items():
+            stats = cache.stats()
+            hits, misses = _reported.get(name, (0, 0))
+            CACHE_LOOKUPS.labels(name, 'hit').inc(stats["hits"] - hits)
+            CACHE_LOOKUPS.labels(name, 'miss').inc(stats["misses"] - misses)
+            CACHE_ENTRIES.labels(name).set(stats["size"])
+            _reported[name] = (stats["hits"], stats["misses"])
+
+def _watch_pool(name: str, engine: Engine) -> None:
+    pool = engine.pool
+    if id(pool) in _watched_pools:
+        return
+    _watched_pools.add(id(pool))
+    if hasattr(pool, 'size'):
+        POOL_SIZE.labels(name).set(pool.size())
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    connects = POOL_CONNECTS.labels(name)
+    invalidated = POOL_INVALIDATED.labels(name)
+
+    def on_connect(dbapi_connection, connection_record):
+        connects.inc()
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        invalidated.inc()
+
+    event.listen(pool, 'connect', on_connect)
+    event.listen(pool, 'checkout', on_checkout)
+    event.listen(pool, 'checkin', on_checkin)
+    event.listen(pool, 'invalidate', on_invalidate)
+
+def count_login(result: str) -> None:
+    """
+    Counts a password login attempt ('success' or 'failure').
+    """
+    if _enabled:
+        LOGINS.labels(result).inc()
+
+@contextmanager
+def password_hash_timer(operation: str):
+    """
+    Times the enclosed password hash ('hash') or check ('verify').
+    """
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+def _record_request(response: Response) -> Response:
+    if request.blueprint == metrics_bp.name:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    method = request.method
+    REQUESTS.labels(route, method, str(response.status_code)).inc()
+    REQUEST_SECONDS.labels(route, method).observe(instrumentation.request_time())
+    REQUEST_QUERIES.labels(route, method).observe(instrumentation.query_count())
+    REQUEST_DB_SECONDS.labels(route, method).observe(instrumentation.db_time())
+    if not response.is_streamed:
+        RESPONSE_BYTES.labels(route, method).observe(response.calculate_content_length() or 0)
+    _report_caches()
+    return response
+
+@metrics_bp.route("/metrics", methods=['GET'])
+def get_metrics():
+    """
+    HTTP GET
+        The metrics of all workers in the Prometheus text format.
+    """
+    _report_caches()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+def init_app(app: Flask) -> None:
+    global _enabled
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    if prometheus_client is None:
+        app.logger.warning("METRICS_ENABLED is set but prometheus_client is not installed; metrics are disabled")
+        return
+    _enabled = True
+    with app.app_context():
+        for key, engine in db.engines.items():
+            _watch_pool(key or "default", engine)
+    app.after_request(_record_request)
+    app.register_blueprint(metrics_bp)
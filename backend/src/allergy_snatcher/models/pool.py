@@ -0,0 +1,82 @@
+"""
+Connection pool statistics of the current worker.
+
+GET /internal/pool reports, for every engine, how many connections are
+checked out, idle in the pool and open beyond pool_size, plus running counts
+of new connections, checkouts and invalidated connections (e.g. ones pre-ping
+found dead). Every gunicorn worker has its own pools, so each response
+describes only the worker that served it (see "pid").
+
+The route is registered only with INTERNAL_ENDPOINTS=true and is meant to be
+reachable from inside the deployment, not through the public proxy.
+"""
+
+from __future__ import annotations
+import os
+from collections import Counter
+from flask import Blueprint, Flask, jsonify
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .database import db
+
+internal_bp = Blueprint('internal', __name__)
+
+# Event counts per pool, keyed by id(pool)
+_counters: dict[int, Counter] = {}
+
+def _watch(engine: Engine) -> None:
+    pool = engine.pool
+    if id(pool) in _counters:
+        return
+    counts = _counters[id(pool)] = Counter()
+
+    def on_connect(dbapi_connection, connection_record):
+        counts['connects'] += 1
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counts['checkouts'] += 1
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        counts['invalidated'] += 1
+
+    event.listen(pool, 'connect', on_connect)
+    event.listen(pool, 'checkout', on_checkout)
+    event.listen(pool, 'invalidate', on_invalidate)
+
+def pool_stats(engine: Engine) -> dict[str, int | str | None]:
+    """
+    Current occupancy and event counts of an engine's pool. Pools without a
+    fixed size (e.g. SQLite's) only report what they support.
+    """
+    pool = engine.pool
+    stats: dict[str, int | str | None] = {"class": type(pool).__name__}
+    if hasattr(pool, 'size'):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # QueuePool counts overflow from -size, so only positive values are extra connections
+            overflow=max(pool.overflow(), 0),
+            max_overflow=getattr(pool, '_max_overflow', None),
+        )
+    counts = _counters.get(id(pool), Counter())
+    stats.update(connects=counts['connects'], checkouts=counts['checkouts'], invalidated=counts['invalidated'])
+    return stats
+
+@internal_bp.route("/internal/pool", methods=['GET'])
+def get_pool_stats():
+    """
+    HTTP GET
+        Connection pool statistics of the worker serving the request, per engine.
+    """
+    return jsonify({
+        "pid": os.getpid(),
+        "engines": {key or "default": pool_stats(engine) for key, engine in db.engines.items()},
+    })
+
+def init_app(app: Flask) -> None:
+    with app.app_context():
+        for engine in db.engines.values():
+            _watch(engine)
+    if app.config.get('INTERNAL_ENDPOINTS'):
+        app.register_blueprint(internal_bp)
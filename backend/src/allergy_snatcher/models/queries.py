@@ -0,0 +1,103 @@
+"""
+Read-only column projections of food rows for the listing endpoints.
+
+Instead of hydrating Food instances with joined-eager category, cuisine and
+restriction chains (which repeats every food row once per restriction and
+fills the identity map), a listing selects just the columns FoodSchema needs
+and loads the restrictions of the returned page with one batched IN query.
+The result is a list of plain dicts shaped like FoodSchema.
+
+Exports stream the same projection with the restrictions outer-joined in, so
+the whole result comes from one server-side cursor (see iter_food_rows).
+"""
+
+from __future__ import annotations
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Iterator
+from sqlalchemy import select
+from .database import db, Food, Category, Cuisine, DietaryRestriction, DietRestrictAssoc
+
+# Scalar Food columns serialized by FoodSchema, in order
+FOOD_COLUMNS = (
+    Food.id, Food.name, Food.brand, Food.publication_status,
+    Food.dietary_fiber, Food.sugars, Food.protein, Food.carbs, Food.cal,
+    Food.cholesterol, Food.sodium, Food.trans_fats, Food.total_fats, Food.sat_fats,
+    Food.serving_amt, Food.serving_unit,
+)
+_FOOD_KEYS = tuple(column.key for column in FOOD_COLUMNS)
+
+def with_food_columns(query):
+    """
+    Turns a filtered Food query into a projection of the FoodSchema columns
+    joined with the category and cuisine names. Apply before ordering/limits.
+    """
+    return (
+        query.with_entities(*FOOD_COLUMNS, Category.id, Category.category, Cuisine.id, Cuisine.cuisine)
+        .join(Food.category)
+        .outerjoin(Food.cuisine)
+    )
+
+def restrictions_by_food(food_ids: list[int]) -> dict[int, list[dict[str, Any]]]:
+    """
+    Loads the dietary restrictions of several foods with a single IN query.
+    """
+    restrictions: dict[int, list[dict[str, Any]]] = {food_id: [] for food_id in food_ids}
+    if not food_ids:
+        return restrictions
+    rows = db.session.execute(
+        select(DietRestrictAssoc.food_id, DietaryRestriction.id, DietaryRestriction.restriction)
+        .join(DietRestrictAssoc.restriction)
+        .where(DietRestrictAssoc.food_id.in_(food_ids))
+        .order_by(DietRestrictAssoc.food_id, DietRestrictAssoc.restriction_id)
+    )
+    for food_id, restriction_id, restriction in rows:
+        restrictions[food_id].append({"id": restriction_id, "restriction": restriction})
+    return restrictions
+
+def fetch_food_rows(query) -> list[dict[str, Any]]:
+    """
+    Executes a with_food_columns() query and returns FoodSchema-shaped dicts.
+    """
+    width = len(_FOOD_KEYS)
+    foods = []
+    for row in query.all():
+        food = dict(zip(_FOOD_KEYS, row[:width]))
+        category_id, category, cuisine_id, cuisine = row[width:]
+        food["category"] = {"id": category_id, "category": category}
+        food["cuisine"] = {"id": cuisine_id, "cuisine": cuisine} if cuisine_id is not None else None
+        foods.append(food)
+
+    restrictions = restrictions_by_food([food["id"] for food in foods])
+    for food in foods:
+        food["dietary_restrictions"] = restrictions[food["id"]]
+    return foods
+
+def iter_food_rows(query, batch_size: int = 1000) -> Iterator[dict[str, Any]]:
+    """
+    Streams a with_food_columns() query as FoodSchema-shaped dicts in id order,
+    fetching batch_size rows at a time. The restrictions are joined into the
+    same statement because a streaming cursor leaves no room for a second query
+    on its connection.
+    """
+    width = len(_FOOD_KEYS)
+    rows = (
+        query.add_columns(DietaryRestriction.id, DietaryRestriction.restriction)
+        .outerjoin(Food.restriction_associations)
+        .outerjoin(DietRestrictAssoc.restriction)
+        .order_by(Food.id, DietRestrictAssoc.restriction_id)
+        .yield_per(batch_size)
+    )
+    for _, group in groupby(rows, key=itemgetter(0)):
+        group = list(group)
+        row = group[0]
+        food = dict(zip(_FOOD_KEYS, row[:width]))
+        category_id, category, cuisine_id, cuisine = row[width:width + 4]
+        food["category"] = {"id": category_id, "category": category}
+        food["cuisine"] = {"id": cuisine_id, "cuisine": cuisine} if cuisine_id is not None else None
+        food["dietary_restrictions"] = [
+            {"id": restriction_id, "restriction": restriction}
+            for restriction_id, restriction in (row[width + 4:] for row in group)
+            if restriction_id is not None
+        ]
+        yield food
@@ -0,0 +1,162 @@
+"""
+Read-replica routing.
+
+With DB_READ_HOSTS set, create_app registers one SQLAlchemy bind per replica
+and lists them in READ_REPLICA_BINDS. Handlers marked @read_only then run
+their queries on a replica, picked round-robin once per request so all of a
+request's reads see the same snapshot. Everything else stays on the primary:
+requests that are not marked, flushes, INSERT/UPDATE/DELETE statements and
+SELECT ... FOR UPDATE. Once a request has written, its remaining reads go to
+the primary too. So do session lookups and the loads of the lookup cache and
+the restriction and text indexes (see primary()): they outlive the request
+and must not keep a lagging snapshot, least of all a revoked session or an
+old role. Listing counts (models/counts.py) may come from a replica; they are
+only cached for COUNT_CACHE_TTL seconds.
+
+Replicas lag behind the primary, so a client that just wrote gets a
+db_primary_until cookie and reads from the primary until it expires
+(REPLICA_STICKY_SECONDS), which makes its own changes visible right away.
+
+A replica is probed with SELECT 1 at most every REPLICA_CHECK_INTERVAL
+seconds when it is picked; one that fails is skipped for an interval. With no
+healthy replica, reads fall back to the primary.
+"""
+
+from __future__ import annotations
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import Flask, Response, current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.dml import UpdateBase
+
+STICKY_COOKIE = 'db_primary_until'
+
+class ReplicaSet:
+    """
+    The replica engines of the app with their health state.
+    """
+
+    def __init__(self, check_interval: float = 10.0):
+        self.check_interval = check_interval
+        self.engines: list[Engine] = []
+        self._turn = itertools.count()
+        self._checked_at: dict[int, float] = {}
+        self._down_until: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, engines: list[Engine]) -> None:
+        with self._lock:
+            self.engines = engines
+            self._checked_at.clear()
+            self._down_until.clear()
+
+    def _healthy(self, index: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._down_until.get(index, 0.0) > now:
+                return False
+            if now - self._checked_at.get(index, float('-inf')) < self.check_interval:
+                return True
+            self._checked_at[index] = now
+        try:
+            with self.engines[index].connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except SQLAlchemyError as error:
+            current_app.logger.warning(f"Read replica {self.engines[index].url} failed its health check: {error}")
+            with self._lock:
+                self._down_until[index] = now + self.check_interval
+            return False
+        return True
+
+    def choose(self) -> Engine | None:
+        """
+        The next healthy replica in turn, or None if there is none.
+        """
+        engines = self.engines
+        for _ in range(len(engines)):
+            index = next(self._turn) % len(engines)
+            if self._healthy(index):
+                return engines[index]
+        return None
+
+
+replicas = ReplicaSet()
+
+def _read_engine() -> Engine | None:
+    """
+    The replica this request reads from, or None for the primary.
+    """
+    if not replicas.engines or not g.get('read_only') or g.get('db_wrote') or g.get('force_primary'):
+        return None
+    if 'read_engine' not in g:
+        sticky_until = request.cookies.get(STICKY_COOKIE, type=float)
+        g.read_engine = None if sticky_until and sticky_until > time.time() else replicas.choose()
+    return g.read_engine
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the reads of @read_only requests to a replica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            writes = (
+                self._flushing or isinstance(clause, UpdateBase)
+                or getattr(clause, '_for_update_arg', None) is not None
+            )
+            if writes:
+                g.db_wrote = True
+            else:
+                engine = _read_engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def primary():
+    """
+    Runs the enclosed queries on the primary, even in a @read_only request.
+    """
+    if not has_request_context():
+        yield
+        return
+    previous = g.get('force_primary', False)
+    g.force_primary = True
+    try:
+        yield
+    finally:
+        g.force_primary = previous
+
+def read_only(f):
+    """
+    Marks a handler whose queries may be served by a read replica.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+def init_app(app: Flask) -> None:
+    replicas.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', 10)
+    with app.app_context():
+        engines = app.extensions['sqlalchemy'].engines
+        replicas.configure([engines[key] for key in app.config.get('READ_REPLICA_BINDS', [])])
+
+    @app.after_request
+    def stick_to_primary(response: Response) -> Response:
+        seconds = current_app.config.get('REPLICA_STICKY_SECONDS', 10)
+        if replicas.engines and g.get('db_wrote') and seconds > 0:
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + seconds), max_age=int(seconds) + 1,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,162 @@
+"""
+In-memory bitset index of food dietary restrictions for include/exclude searches.
+
+Every food is kept as (mask, publication_status, user_id), where bit k of the
+mask is set when the food carries the k-th dietary restriction seen by the
+index. A multi-restriction query is then one AND per food instead of a join
+per restriction.
+
+The index is loaded on first use and kept up to date incrementally: committed
+changes to a food mark it stale (see models/food_changes.py), and the next
+search reloads just the stale foods. Changes made through other workers are
+picked up by a full rebuild every RESTRICTION_INDEX_TTL seconds.
+"""
+
+from __future__ import annotations
+import bisect
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterable, NamedTuple
+from flask import Flask
+from sqlalchemy import select
+from . import food_changes
+from .database import db, Food, DietRestrictAssoc
+from .replicas import primary
+
+class _Entry(NamedTuple):
+    mask: int
+    publication_status: str
+    user_id: int | None
+
+class RestrictionIndex:
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._bits: dict[int, int] = {}          # restriction id -> bit position
+        self._entries: dict[int, _Entry] = {}    # food id -> entry
+        self._ids: list[int] = []                # sorted food ids
+        self._stale: set[int] = set()
+        self._loaded_at: float | None = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _bit(bits: dict[int, int], restriction_id: int) -> int:
+        if restriction_id not in bits:
+            bits[restriction_id] = len(bits)
+        return 1 << bits[restriction_id]
+
+    def mask(self, restriction_ids: Iterable[int]) -> int | None:
+        """
+        Bitmask of the given restriction ids, or None if any of them is not
+        carried by any indexed food.
+        """
+        mask = 0
+        for restriction_id in restriction_ids:
+            if restriction_id not in self._bits:
+                return None
+            mask |= 1 << self._bits[restriction_id]
+        return mask
+
+    @primary()
+    def _load(self, bits: dict[int, int], food_ids: list[int] | None = None) -> dict[int, _Entry]:
+        foods = select(Food.id, Food.publication_status, Food.user_id)
+        assocs = select(DietRestrictAssoc.food_id, DietRestrictAssoc.restriction_id)
+        if food_ids is not None:
+            foods = foods.where(Food.id.in_(food_ids))
+            assocs = assocs.where(DietRestrictAssoc.food_id.in_(food_ids))
+
+        masks: dict[int, int] = {}
+        for food_id, restriction_id in db.session.execute(assocs):
+            masks[food_id] = masks.get(food_id, 0) | self._bit(bits, restriction_id)
+        return {
+            food_id: _Entry(masks.get(food_id, 0), status, user_id)
+            for food_id, status, user_id in db.session.execute(foods)
+        }
+
+    def _rebuild(self) -> None:
+        # Swapped in only once loaded, so a failed load keeps the previous index
+        bits: dict[int, int] = {}
+        entries = self._load(bits)
+        self._bits, self._entries, self._ids = bits, entries, sorted(entries)
+        self._stale = set()
+        self._loaded_at = time.monotonic()
+
+    def _refresh_stale(self) -> None:
+        stale = list(self._stale)
+        fresh = self._load(self._bits, stale)
+        self._stale = set()
+        for food_id in stale:
+            entry = fresh.get(food_id)
+            known = food_id in self._entries
+            if entry is None:
+                if known:
+                    del self._entries[food_id]
+                    self._ids.pop(bisect.bisect_left(self._ids, food_id))
+            else:
+                if not known:
+                    bisect.insort(self._ids, food_id)
+                self._entries[food_id] = entry
+
+    def ensure_current(self) -> None:
+        """
+        Loads or rebuilds the index if needed and applies pending stale foods.
+        Must run inside an app context.
+        """
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._rebuild()
+            elif self._stale:
+                self._refresh_stale()
+
+    def mark_stale(self, food_ids: Iterable[int]) -> None:
+        with self._lock:
+            if self._loaded_at is not None:
+                self._stale.update(food_ids)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def search(
+        self,
+        include: Iterable[int],
+        exclude: Iterable[int],
+        visible: Callable[[str, int | None], bool],
+        after_id: int = 0,
+        limit: int = 50,
+    ) -> list[int]:
+        """
+        Returns up to `limit` food ids greater than `after_id`, in id order, that
+        carry every restriction in `include`, none in `exclude`, and pass
+        `visible(publication_status, user_id)`.
+        """
+        self.ensure_current()
+        with self._lock:
+            include_mask = self.mask(include)
+            if include_mask is None:
+                return []
+            exclude_mask = 0
+            for restriction_id in exclude:
+                if restriction_id in self._bits:
+                    exclude_mask |= 1 << self._bits[restriction_id]
+
+            matches = []
+            start = bisect.bisect_right(self._ids, after_id)
+            for food_id in islice(self._ids, start, None):
+                entry = self._entries[food_id]
+                if entry.mask & exclude_mask or entry.mask & include_mask != include_mask:
+                    continue
+                if not visible(entry.publication_status, entry.user_id):
+                    continue
+                matches.append(food_id)
+                if len(matches) == limit:
+                    break
+            return matches
+
+
+restriction_index = RestrictionIndex()
+food_changes.subscribe(restriction_index.mark_stale)
+
+def init_app(app: Flask) -> None:
+    restriction_index.ttl = app.config.get('RESTRICTION_INDEX_TTL', 60)
+    restriction_index.invalidate()
@@ -0,0 +1,240 @@
+"""
+Full-text search over food names and ingredient strings.
+
+Every search term is required and matched as a word prefix, so "wheat flo"
+finds "ENRICHED FLOUR (WHEAT FLOUR, NIACIN...)". Name hits weigh double
+ingredient hits when ranking.
+
+On MySQL the search runs against the FULLTEXT indexes on foods.name and
+ingredients.ingredient_name in BOOLEAN MODE, where all terms must occur in the
+name or in a single ingredient. InnoDB does not index stopwords or words
+shorter than innodb_ft_min_token_size (FULLTEXT_MIN_TOKEN_SIZE here), so such
+terms would match nothing; they are sent as optional terms instead. On other databases (e.g. SQLite), or with
+FULLTEXT_SEARCH=memory, it is answered by an in-process inverted index, where
+the terms may be spread over the name and ingredients. That index is kept
+current the same way as the restriction index (see models/food_changes.py).
+"""
+
+from __future__ import annotations
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from typing import Callable, Iterable, NamedTuple
+from flask import Flask, current_app
+from sqlalchemy import and_, func, or_, select, union_all
+from sqlalchemy.dialects.mysql import match
+from . import food_changes
+from .database import db, Food, Ingredient
+from .replicas import primary
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+# InnoDB's default stopword list (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD)
+INNODB_STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to',
+    'was', 'what', 'when', 'where', 'who', 'will', 'with', 'und', 'www',
+))
+NAME_WEIGHT = 2.0
+INGREDIENT_WEIGHT = 1.0
+
+def tokenize(text: str | None) -> list[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def use_fulltext() -> bool:
+    """
+    Whether searches should use the MySQL FULLTEXT indexes.
+    """
+    mode = current_app.config.get('FULLTEXT_SEARCH', 'auto')
+    return mode != 'memory' and db.engine.dialect.name == 'mysql'
+
+def fulltext_query(terms: list[str], visible_query, after: tuple[float, int] | None = None):
+    """
+    Ranks foods with MySQL FULLTEXT. `visible_query` is a Food query carrying the
+    visibility filters; the returned query selects (food id, score) ranked best first,
+    starting after the (score, food id) `after` when given.
+    """
+    min_token_size = current_app.config.get('FULLTEXT_MIN_TOKEN_SIZE', 3)
+    against = ' '.join(
+        f'{term}*' if len(term) < min_token_size or term in INNODB_STOPWORDS else f'+{term}*'
+        for term in terms
+    )
+    ingredient_match = match(Ingredient.ingredient_name, against=against).in_boolean_mode()
+    name_match = match(Food.name, against=against).in_boolean_mode()
+    hits = union_all(
+        select(Ingredient.food_id.label('food_id'), (ingredient_match * INGREDIENT_WEIGHT).label('score'))
+        .where(ingredient_match),
+        select(Food.id.label('food_id'), (name_match * NAME_WEIGHT).label('score'))
+        .where(name_match),
+    ).subquery()
+    ranked = (
+        select(hits.c.food_id, func.max(hits.c.score).label('score'))
+        .group_by(hits.c.food_id)
+        .subquery()
+    )
+    query = visible_query.join(ranked, ranked.c.food_id == Food.id)
+    if after is not None:
+        score, food_id = after
+        query = query.filter(or_(ranked.c.score < score, and_(ranked.c.score == score, Food.id > food_id)))
+    return query.with_entities(Food.id, ranked.c.score).order_by(ranked.c.score.desc(), Food.id)
+
+
+class _Doc(NamedTuple):
+    publication_status: str
+    user_id: int | None
+    tokens: frozenset[str]
+
+class TextIndex:
+    """
+    In-process inverted index: token -> {food id: weight}, with a sorted token
+    list for prefix lookups.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._postings: dict[str, dict[int, float]] = {}
+        self._tokens: list[str] = []
+        self._docs: dict[int, _Doc] = {}
+        self._stale: set[int] = set()
+        self._loaded_at: float | None = None
+        self._lock = threading.RLock()
+
+    @primary()
+    def _load(self, food_ids: list[int] | None = None) -> dict[int, tuple]:
+        foods = select(Food.id, Food.name, Food.publication_status, Food.user_id)
+        ingredients = select(Ingredient.food_id, Ingredient.ingredient_name)
+        if food_ids is not None:
+            foods = foods.where(Food.id.in_(food_ids))
+            ingredients = ingredients.where(Ingredient.food_id.in_(food_ids))
+
+        names: dict[int, list[str]] = {}
+        for food_id, ingredient_name in db.session.execute(ingredients):
+            names.setdefault(food_id, []).append(ingredient_name)
+        return {
+            food_id: (name, status, user_id, names.get(food_id, []))
+            for food_id, name, status, user_id in db.session.execute(foods)
+        }
+
+    def _add(self, food_id: int, name: str, status: str, user_id: int | None, ingredients: list[str]) -> None:
+        weights: dict[str, float] = {}
+        for token in tokenize(name):
+            weights[token] = NAME_WEIGHT
+        for ingredient in ingredients:
+            for token in tokenize(ingredient):
+                weights.setdefault(token, INGREDIENT_WEIGHT)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._tokens, token)
+            postings[food_id] = weight
+        self._docs[food_id] = _Doc(status, user_id, frozenset(weights))
+
+    def _remove(self, food_id: int) -> None:
+        doc = self._docs.pop(food_id, None)
+        if doc is None:
+            return
+        for token in doc.tokens:
+            postings = self._postings[token]
+            postings.pop(food_id, None)
+            if not postings:
+                del self._postings[token]
+                self._tokens.pop(bisect.bisect_left(self._tokens, token))
+
+    def _rebuild(self) -> None:
+        # Loaded before the index is emptied, so a failed load keeps the previous one
+        rows = self._load()
+        self._postings, self._tokens, self._docs = {}, [], {}
+        for food_id, row in rows.items():
+            self._add(food_id, *row)
+        self._stale = set()
+        self._loaded_at = time.monotonic()
+
+    def _refresh_stale(self) -> None:
+        stale = list(self._stale)
+        fresh = self._load(stale)
+        self._stale = set()
+        for food_id in stale:
+            self._remove(food_id)
+            if food_id in fresh:
+                self._add(food_id, *fresh[food_id])
+
+    def ensure_current(self) -> None:
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._rebuild()
+            elif self._stale:
+                self._refresh_stale()
+
+    def mark_stale(self, food_ids: Iterable[int]) -> None:
+        with self._lock:
+            if self._loaded_at is not None:
+                self._stale.update(food_ids)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _term_scores(self, term: str) -> dict[int, float]:
+        """
+        Best weight per food over every token starting with `term`, scaled by
+        the token's inverse document frequency.
+        """
+        scores: dict[int, float] = {}
+        total = len(self._docs) or 1
+        i = bisect.bisect_left(self._tokens, term)
+        while i < len(self._tokens) and self._tokens[i].startswith(term):
+            postings = self._postings[self._tokens[i]]
+            idf = math.log(1 + total / len(postings))
+            for food_id, weight in postings.items():
+                score = weight * idf
+                if score > scores.get(food_id, 0.0):
+                    scores[food_id] = score
+            i += 1
+        return scores
+
+    def search(
+        self,
+        terms: list[str],
+        visible: Callable[[str, int | None], bool],
+        limit: int = 50,
+        after: tuple[float, int] | None = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Returns (food id, score) of the foods matching every term (as a prefix), best
+        ranked first, starting after the (score, food id) `after` when given.
+        """
+        self.ensure_current()
+        with self._lock:
+            scores: dict[int, float] | None = None
+            for term in terms:
+                term_scores = self._term_scores(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {food_id: score + term_scores[food_id]
+                              for food_id, score in scores.items() if food_id in term_scores}
+                if not scores:
+                    return []
+            if scores is None:
+                return []
+            if after is not None:
+                after_key = (-after[0], after[1])
+                scores = {food_id: score for food_id, score in scores.items() if (-score, food_id) > after_key}
+            ranked = heapq.nsmallest(
+                limit,
+                (food_id for food_id in scores
+                 if visible(self._docs[food_id].publication_status, self._docs[food_id].user_id)),
+                key=lambda food_id: (-scores[food_id], food_id)
+            )
+            return [(food_id, scores[food_id]) for food_id in ranked]
+
+
+text_index = TextIndex()
+food_changes.subscribe(text_index.mark_stale)
+
+def init_app(app: Flask) -> None:
+    text_index.ttl = app.config.get('TEXT_INDEX_TTL', 60)
+    text_index.invalidate()
@@ -2,7 +2,9 @@ from flask import Blueprint, request, url_for, session, redirect, jsonify, g, Fl
 from authlib.integrations.flask_client import OAuth
 from werkzeug.security import generate_password_hash, check_password_hash
 from ..models.database import db, User, Password, OAuthAccount, UserSession
-from ..models.auth import require_session
+from ..models.auth import require_session, resolve_session, invalidate_session, invalidate_user_sessions
+from ..models.replicas import primary, read_only
+from ..models.metrics import count_login, password_hash_timer
 import secrets
 import datetime
 import os
@@ -45,7 +47,9 @@ def register():
         return jsonify({'error': 'Username or email already exists'}), 400
 
     new_user = User(username=username, email=email, role=role) # pyright: ignore[reportCallIssue]
-    new_password = Password(password_hash=generate_password_hash(password), user=new_user) # type: ignore
+    with password_hash_timer('hash'):
+        password_hash = generate_password_hash(password)
+    new_password = Password(password_hash=password_hash, user=new_user) # type: ignore
     
     db.session.add(new_user)
     db.session.add(new_password)
@@ -64,8 +68,15 @@ def login():
 
     user = User.query.filter_by(username=username).first()
 
-    if not user or not user.password or not check_password_hash(user.password.password_hash, password):
+    if not user or not user.password:
+        count_login('failure')
         return jsonify({'error': 'Invalid username or password'}), 401
+    with password_hash_timer('verify'):
+        valid = check_password_hash(user.password.password_hash, password)
+    if not valid:
+        count_login('failure')
+        return jsonify({'error': 'Invalid username or password'}), 401
+    count_login('success')
 
     # Create a new session
     session_token = secrets.token_hex(32)
@@ -107,6 +118,7 @@ def login():
     
     return response
 
+@primary()
 def _refresh_session(refresh_token: str):
     """
     Refreshes a user session using a refresh token.
@@ -118,6 +130,9 @@ def _refresh_session(refresh_token: str):
         A tuple containing the new session token, new refresh token,
         new session expiry, and new refresh expiry.
         Returns a tuple of Nones if the refresh token is invalid or expired.
+
+    Runs on the primary, also from the @read_only /auth/status: a lagging replica
+    could miss a token that was just rotated, or return a row already rotated.
     """
     if not refresh_token:
         return None, None, None, None
@@ -127,6 +142,10 @@ def _refresh_session(refresh_token: str):
     if not user_session:
         return None, None, None, None
 
+    # The current session token is replaced or deleted below either way; it leaves
+    # the session cache once that commits
+    invalidate_session(user_session.session_token)
+
     refresh_exp = _ensure_aware(user_session.refresh_token_expires_at)
     if refresh_exp and refresh_exp < _utc_now():
         db.session.delete(user_session)
@@ -179,6 +198,7 @@ def refresh(referrer:str='/'):
     return response
 
 @auth_bp.route('/auth/status', methods=['GET'])
+@read_only
 def status():
     """
     Checks if a user is logged in by verifying their session token.
@@ -188,9 +208,9 @@ def status():
     session_token = request.cookies.get('session_token')
     
 
-    user_session = None
+    user_session, user = None, None
     if session_token:
-        user_session = UserSession.query.filter_by(session_token=session_token).first()
+        user_session, user = resolve_session(session_token)
 
     # If session is invalid or expired, try to refresh
     session_exp = _ensure_aware(user_session.expires_at) if user_session else None
@@ -209,13 +229,12 @@ def status():
             return response, 200
 
         # If refresh is successful, fetch the user session again with the new token
-        user_session = UserSession.query.filter_by(session_token=new_session_token).first()
-        if not user_session:
+        user_session, user = resolve_session(new_session_token)
+        if not user_session or not user:
             # This should not happen if _refresh_session succeeded, but as a safeguard:
             return jsonify({"logged_in": False, "user": None}), 200
 
         # User is now considered logged in with the new session
-        user = user_session.user
         response = jsonify({
             "logged_in": True,
             "user": {
@@ -248,7 +267,8 @@ def status():
         return response, 200
 
     # If the original session token was valid
-    user = user_session.user
+    if not user:
+        return jsonify({"logged_in": False, "user": None}), 200
     return jsonify({
         "logged_in": True,
         "user": {
@@ -267,6 +287,7 @@ def logout():
     # The require_session decorator puts the session object in g
     user_session = g.session 
 
+    invalidate_session(user_session.session_token)
     db.session.delete(user_session)
     db.session.commit()
 
@@ -413,6 +434,7 @@ def oauth_logout():
                     # Delete all sessions for this user
                     UserSession.query.filter_by(user_id=oauth_account.user_id).delete()
                     db.session.commit()
+                    invalidate_user_sessions(oauth_account.user_id)
                     # Break the loop once the user is found and logged out
                     break
         except Exception as e:
@@ -1,12 +1,33 @@
-from flask import Blueprint, jsonify, request, g
+import base64
+import csv
+import hashlib
+import io
+import json
+from itertools import groupby
+from operator import itemgetter
+from flask import Blueprint, jsonify, request, g, current_app, stream_with_context
 from pydantic import ValidationError
-from sqlalchemy import or_
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
+from ..models.allergens import suggest_restriction_ids
 from ..models.auth import require_session, require_role, require_force, optional_session
+from ..models import food_changes
+from ..models.cache import lookup_cache
+from ..models.conditional import (
+    catalog_version_query, conditional_listing, make_etag, not_modified, not_modified_response, with_cache_headers
+)
+from ..models.counts import total_count, facet_counts
+from ..models.lookups import get_lookup, invalidate_lookup
+from ..models.queries import with_food_columns, fetch_food_rows, iter_food_rows
+from ..models.replicas import read_only
+from ..models.restriction_index import restriction_index
+from ..models.text_search import tokenize, use_fulltext, fulltext_query, text_index
 from ..models.database import Category, Cuisine, db, Food, Ingredient, DietaryRestriction, DietRestrictAssoc
 from ..models.http import (
     CategorySchema, CuisineSchema, CreateCategorySchema, CreateCuisineSchema, 
-    DietaryRestrictionSchema, CreateDietaryRestrictionSchema, FoodSchema, CreateFoodSchema, CreateIngredientSchema, UpdateFoodSchema
+    DietaryRestrictionSchema, CreateDietaryRestrictionSchema, FoodSchema, CreateFoodSchema, CreateIngredientSchema, UpdateFoodSchema,
+    ModerateFoodsSchema, FoodListAdapter, FoodAdapter
 )
 
 
@@ -25,48 +46,299 @@ def handle_validation_error(error: ValidationError):
     }
     return jsonify(response), 422
 
+@routes.errorhandler(IntegrityError)
+def handle_integrity_error(error: IntegrityError):
+    """
+    A write that still breaks a constraint after validation, e.g. a lookup row
+    another worker deleted and recreated meanwhile. The client may retry.
+    """
+    db.session.rollback()
+    current_app.logger.warning(f"Write rejected by the database: {error.orig}")
+    return jsonify({"error": "The change conflicts with concurrent changes, please retry"}), 409
+
+
+# Page size bounds for cursor-paged listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Words of a text search query beyond this are ignored
+MAX_SEARCH_TERMS = 8
+# Foods accepted by one bulk create request, and flushed to the database at a time
+MAX_BULK_FOODS = 5000
+BULK_FLUSH_SIZE = 200
+# Rows fetched from the database cursor, and foods written to the response, at a time
+EXPORT_BATCH_SIZE = 1000
+# Columns of a CSV export. The last three hold names, the restrictions joined with ';'
+EXPORT_CSV_COLUMNS = (
+    'id', 'name', 'brand', 'dietary_fiber', 'sugars', 'protein', 'carbs', 'cal', 'cholesterol', 'sodium',
+    'trans_fats', 'total_fats', 'sat_fats', 'serving_amt', 'serving_unit', 'category', 'cuisine',
+    'dietary_restrictions',
+)
+
+def _encode_cursor(key: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode()
+
+def _decode_cursor(cursor: str, length: int, first: type | tuple[type, ...] = str) -> list | None:
+    """
+    Decodes an opaque cursor into its sort key, or None if it is malformed. Keys end
+    with a food id; two-part keys start with a value of type `first`.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not isinstance(key, list) or len(key) != length or not isinstance(key[-1], int) or key[-1] < 0:
+        return None
+    if length == 2 and not isinstance(key[0], first):
+        return None
+    return key
+
+def _json_response(body: bytes, status: int = 200):
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+def _serialize_foods(foods, **dump_kwargs) -> bytes:
+    """
+    Serializes food rows (Food instances or FoodSchema-shaped dicts) straight to
+    JSON bytes with a single TypeAdapter pass, instead of building a FoodSchema
+    and a dict per row for jsonify.
+    """
+    return FoodListAdapter.dump_json(FoodListAdapter.validate_python(foods, from_attributes=True), **dump_kwargs)
+
+def _showhidden(showhidden: str | None) -> bool:
+    if showhidden is None:
+        showhidden = request.args.get('showhidden', 'false')
+    return str(showhidden).lower() == 'true'
+
+def _filter_visible(query, showhidden: bool):
+    """
+    Applies the listing visibility rules: admins see public, unlisting and their own
+    private foods (everything with showhidden), contributors see public foods and their
+    own, and anonymous users see public foods only.
+    """
+    if g.user and g.user.role == 'admin':
+        if not showhidden:
+            query = query.filter(or_(Food.publication_status != 'private', Food.user_id == g.user.id))
+    elif g.user:
+        query = query.filter(or_(Food.publication_status == 'public', Food.user_id == g.user.id))
+    else:
+        query = query.filter(Food.publication_status == 'public')
+    return query
+
+def _is_visible(showhidden: bool):
+    """
+    The rules of _filter_visible as a (publication_status, user_id) predicate
+    for the in-memory indexes.
+    """
+    user = g.user
+    if user and user.role == 'admin':
+        if showhidden:
+            return lambda status, owner: True
+        return lambda status, owner: status != 'private' or owner == user.id
+    if user:
+        return lambda status, owner: status == 'public' or owner == user.id
+    return lambda status, owner: status == 'public'
+
+def _parse_ids(name: str) -> list[int] | None:
+    """
+    Parses a comma separated list of ids from the query string, or None if malformed.
+    """
+    try:
+        return [int(part) for part in request.args.get(name, '').split(',') if part.strip()]
+    except ValueError:
+        return None
+
+def _page_limit() -> int:
+    return max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+def _restriction_criteria(include: list[int], exclude: list[int]) -> list:
+    """
+    SQL form of a restriction search: every include id and none of the exclude ids.
+    """
+    criteria = [
+        Food.restriction_associations.any(DietRestrictAssoc.restriction_id == restriction_id)
+        for restriction_id in include
+    ]
+    if exclude:
+        criteria.append(~Food.restriction_associations.any(DietRestrictAssoc.restriction_id.in_(exclude)))
+    return criteria
+
+def _fetch_foods_by_id(food_ids: list[int], showhidden: bool, *criteria) -> list:
+    """
+    Loads foods picked by an in-memory index, in the given order. Visibility and
+    the given criteria (the search the index answered) are re-checked in SQL in
+    case the index lags behind another worker; foods failing them are dropped.
+    """
+    if not food_ids:
+        return []
+    query = _filter_visible(Food.query.filter(Food.id.in_(food_ids), *criteria), showhidden)
+    by_id = {food["id"]: food for food in fetch_food_rows(with_food_columns(query))}
+    return [by_id[food_id] for food_id in food_ids if food_id in by_id]
+
+def _suggested_restriction_ids(food: Food) -> list[int]:
+    """
+    Dietary restrictions implied by the food's ingredients that it is not tagged with.
+    """
+    return suggest_restriction_ids(
+        (ingredient.ingredient_name for ingredient in food.ingredients),
+        get_lookup('dietary_restrictions').names,
+        (assoc.restriction_id for assoc in food.restriction_associations),
+    )
+
+def _page_response(foods, next_cursor: str | None, counts: dict | None = None, **dump_kwargs):
+    body = (
+        b'{"foods":' + _serialize_foods(foods, **dump_kwargs)
+        + b',"next_cursor":' + json.dumps(next_cursor).encode()
+    )
+    if counts:
+        body += b',' + json.dumps(counts, separators=(',', ':'))[1:-1].encode()
+    return _json_response(body + b'}')
+
+def _listing_counts(query) -> dict:
+    """
+    The total and facet counts requested with ?count=true / ?facets=true for a filtered Food query.
+    """
+    counts: dict = {}
+    if request.args.get('count', 'false').lower() == 'true':
+        counts["total"] = total_count(query)
+    if request.args.get('facets', 'false').lower() == 'true':
+        counts["facets"] = facet_counts(query)
+    return counts
+
+def _list_foods(query, limit: int | None, offset: int | None, by_name: bool = True, **dump_kwargs):
+    """
+    Orders and pages a filtered Food query, ordered by (name, id) or by id alone.
+    Rows are loaded as a column projection (see models/queries.py), so the query
+    should not carry loader options.
+
+    The legacy path routes page with LIMIT/OFFSET and return a bare list. The query-string
+    routes, or any request carrying ?cursor=, page by keyset instead and return
+    {"foods": [...], "next_cursor": ...}; passing next_cursor back as ?cursor= returns the
+    following page at the same cost regardless of depth.
+
+    With ?count=true and/or ?facets=true the keyset response also carries the total and facet
+    counts of the whole filtered query (see models/counts.py); the legacy path sends the total
+    as an X-Total-Count header.
+    """
+    counts = _listing_counts(query)
+    order = (Food.name, Food.id) if by_name else (Food.id,)
+    query = with_food_columns(query).order_by(*order)
+
+    if offset is not None and 'cursor' not in request.args:
+        foods = fetch_food_rows(query.limit(limit).offset(offset))
+        response = _json_response(_serialize_foods(foods, **dump_kwargs))
+        if "total" in counts:
+            response.headers['X-Total-Count'] = str(counts["total"])
+        return response
+
+    limit = _page_limit() if limit is None else max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        key = _decode_cursor(cursor, len(order))
+        if key is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+        if by_name:
+            name, food_id = key
+            query = query.filter(or_(Food.name > name, and_(Food.name == name, Food.id > food_id)))
+        else:
+            query = query.filter(Food.id > key[0])
+
+    # Fetch one extra row to learn whether another page exists
+    foods = fetch_food_rows(query.limit(limit + 1))
+    next_cursor = None
+    if len(foods) > limit:
+        foods = foods[:limit]
+        last = foods[-1]
+        next_cursor = _encode_cursor([last["name"], last["id"]] if by_name else [last["id"]])
+
+    return _page_response(foods, next_cursor, counts, **dump_kwargs)
+
+
+def _export_ndjson(foods):
+    lines = []
+    for food in foods:
+        lines.append(FoodAdapter.dump_json(FoodAdapter.validate_python(food)))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+def _export_csv(foods):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    for count, food in enumerate(foods, 1):
+        writer.writerow([
+            *(food[column] for column in EXPORT_CSV_COLUMNS[:-3]),
+            food["category"]["category"],
+            food["cuisine"]["cuisine"] if food["cuisine"] else None,
+            ';'.join(restriction["restriction"] for restriction in food["dietary_restrictions"]),
+        ])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _lookup_response(table: str, model, schema):
+    """
+    Serves a lookup table listing from the lookup cache with a strong ETag,
+    answering If-None-Match revalidation with 304 Not Modified.
+    """
+    def load():
+        rows = model.query.all()
+        body = current_app.json.dumps([schema.model_validate(r).model_dump() for r in rows]).encode()
+        return body, hashlib.sha256(body).hexdigest()
+
+    body, etag = lookup_cache.get_or_load(table, load)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let clients keep a copy but revalidate it on every use
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @routes.route("/api/categories/", methods=['GET'])
+@read_only
 def get_categories():
     '''
     HTTP GET
         Returns a list of categories of food  and their ID's from the database.
-        Doesn't require authentication.
+        Doesn't require authentication. Served from cache with an ETag.
     '''
     
-    categories = Category.query.all()
-    category_schemas = [CategorySchema.model_validate(c).model_dump() for c in categories]
-    return jsonify(category_schemas)
+    return _lookup_response('categories', Category, CategorySchema)
 
 @routes.route("/api/cuisines/", methods=['GET'])
+@read_only
 def get_cuisines():
     '''
     HTTP GET
         Returns a list of cuisines of food and their ID's from the database.
-        Doesn't require authentication.
+        Doesn't require authentication. Served from cache with an ETag.
     '''
     
-    cuisines = Cuisine.query.all()
-    cuisine_schemas = [CuisineSchema.model_validate(c).model_dump() for c in cuisines]
-    return jsonify(cuisine_schemas)
+    return _lookup_response('cuisines', Cuisine, CuisineSchema)
 
 @routes.route("/api/diet-restrictions/", methods=['GET'])
+@read_only
 def get_diet_restrictions():
     '''
     HTTP GET
         Returns a list of diet restrictions of food and their ID's from the database.
-        Doesn't require authentication.
+        Doesn't require authentication. Served from cache with an ETag.
     '''
     
-    diet_rest = DietaryRestriction.query.all()
-    diet_rest_schemas = [DietaryRestrictionSchema.model_validate(dr).model_dump() for dr in diet_rest]
-    return jsonify(diet_rest_schemas)
+    return _lookup_response('dietary_restrictions', DietaryRestriction, DietaryRestrictionSchema)
 
 
 
+@routes.route("/api/foods/", methods=['GET'], defaults={"limit": None, "offset": None, "showhidden": None})
 @routes.route("/api/foods/<int:limit>/<int:offset>/<string:showhidden>", methods=['GET'])
+@read_only
 @optional_session
-def get_foods(showhidden: str|bool, limit: int, offset: int):
+@conditional_listing
+def get_foods(showhidden: str|bool|None, limit: int|None, offset: int|None):
     """
     HTTP GET
         Returns a list of food objects from the database. Gets list of all public foods, includes
@@ -75,31 +347,113 @@ def get_foods(showhidden: str|bool, limit: int, offset: int):
         of the showhidden parameter.
         Doesn't require authentication.
     """
-    showhidden = str(showhidden).lower() == 'true'
-    query = Food.query.options(
-        joinedload(Food.category),
-        joinedload(Food.cuisine),
-        joinedload(Food.restriction_associations).joinedload(DietRestrictAssoc.restriction)
-    )
+    showhidden = _showhidden(showhidden)
+    query = _filter_visible(Food.query, showhidden)
 
-    if g.user and g.user.role == 'admin':
-        if not showhidden:
-            query = query.filter(Food.publication_status != 'private')
-    elif g.user:
-        query = query.filter(
-            or_(
-                Food.publication_status == 'public',
-                Food.user_id == g.user.id
-            )
-        )
+    return _list_foods(query, limit, offset)
+    
+@routes.route("/api/foods/search", methods=['GET'])
+@read_only
+@optional_session
+def search_foods():
+    """
+    HTTP GET
+        Returns foods that carry every dietary restriction in ?include= and none of the
+        restrictions in ?exclude= (comma separated restriction ids), e.g.
+        /api/foods/search?include=3&exclude=1,4. Answered from the in-memory restriction
+        bitset index, in id order, paged with ?limit= and ?cursor= like the other cursor routes.
+        Doesn't require authentication. Same visibility rules as listing by category, including
+        ?showhidden= for admins.
+    """
+    include = _parse_ids('include')
+    exclude = _parse_ids('exclude')
+    if include is None or exclude is None:
+        return jsonify({"error": "include and exclude must be comma separated restriction ids"}), 400
+
+    limit = _page_limit()
+    after_id = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        key = _decode_cursor(cursor, 1)
+        if key is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+        after_id = key[0]
+
+    showhidden = _showhidden(None)
+    food_ids = restriction_index.search(include, exclude, _is_visible(showhidden), after_id, limit + 1)
+    next_cursor = None
+    if len(food_ids) > limit:
+        food_ids = food_ids[:limit]
+        next_cursor = _encode_cursor([food_ids[-1]])
+
+    foods = _fetch_foods_by_id(food_ids, showhidden, *_restriction_criteria(include, exclude))
+    return _page_response(foods, next_cursor)
+
+@routes.route("/api/foods/text-search", methods=['GET'])
+@read_only
+@optional_session
+def text_search_foods():
+    """
+    HTTP GET
+        Searches food names and ingredient text, e.g. /api/foods/text-search?q=wheat+flo.
+        Every word of ?q= must match, as a word prefix, and the best matches come first.
+        Paged with ?limit= and ?cursor= like the other cursor routes; the cursor holds the
+        (score, id) of the last food, so later pages skip no rows. Every match is still
+        scored to rank it, and a score can change between pages when the catalog does.
+        Uses the MySQL FULLTEXT indexes, or an in-process index on other databases.
+        Doesn't require authentication. Same visibility rules as listing by category.
+    """
+    terms = tokenize(request.args.get('q'))[:MAX_SEARCH_TERMS]
+    if not terms:
+        return jsonify({"error": "Query parameter q must contain at least one word"}), 400
+
+    limit = _page_limit()
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        key = _decode_cursor(cursor, 2, (int, float))
+        if key is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+        after = (float(key[0]), key[1])
+
+    showhidden = _showhidden(None)
+    if use_fulltext():
+        ranked = fulltext_query(terms, _filter_visible(Food.query, showhidden), after)
+        hits = [(food_id, score) for food_id, score in ranked.limit(limit + 1)]
     else:
-        query = query.filter(Food.publication_status == 'public')
+        hits = text_index.search(terms, _is_visible(showhidden), limit + 1, after)
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        last_id, last_score = hits[-1]
+        next_cursor = _encode_cursor([last_score, last_id])
+    return _page_response(_fetch_foods_by_id([food_id for food_id, _ in hits], showhidden), next_cursor)
+
+@routes.route("/api/foods/export", methods=['GET'])
+@read_only
+def export_foods():
+    """
+    HTTP GET
+        Streams every public food as NDJSON (default) or CSV, ordered by id. Rows are read from a
+        server-side cursor and written out in batches, so memory use does not grow with the catalog.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+    query = with_food_columns(Food.query.filter(Food.publication_status == 'public'))
+    foods = iter_food_rows(query, EXPORT_BATCH_SIZE)
+    if export_format == 'csv':
+        body, mimetype = _export_csv(foods), 'text/csv'
+    else:
+        body, mimetype = _export_ndjson(foods), 'application/x-ndjson'
+    response = current_app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=foods.{export_format}'
+    return response
 
-    foods = query.limit(limit).offset(offset).all()
-    food_schemas = [FoodSchema.model_validate(f).model_dump() for f in foods]
-    return jsonify(food_schemas)
-    
 @routes.route("/api/foods/<int:food_id>", methods=['GET'])
+@read_only
 @optional_session
 def get_food_by_id(food_id):
     """
@@ -107,29 +461,45 @@ def get_food_by_id(food_id):
         Returns food object and its information from the database.
         Doesn't require authentication if food is public, otherwise, requires
         authentication from either contributor or admin.
+        Supports conditional requests (ETag / Last-Modified).
     """
+    # Visibility and validators come from one narrow query, so a 304 never loads the food
+    state = db.session.execute(
+        select(Food.publication_status, Food.user_id, Food.updated_at, catalog_version_query().label('version'))
+        .where(Food.id == food_id)
+    ).first()
+
+    if not state:
+        return jsonify({"error": "Food not found"}), 404
+
+    is_public = state.publication_status == 'public'
+    is_admin = g.user and g.user.role == 'admin'
+    is_owner = g.user and state.user_id == g.user.id
+
+    if not (is_public or is_admin or is_owner):
+        # Return 404 to conceal the existence of the resource from unauthorized users
+        return jsonify({"error": "Food not found"}), 404
+
+    etag = make_etag("food", food_id, state.updated_at, state.version or 0)
+    if not_modified(etag, state.updated_at):
+        return not_modified_response(etag, state.updated_at)
+
     food = Food.query.options(
         joinedload(Food.category),
         joinedload(Food.cuisine),
         joinedload(Food.restriction_associations).joinedload(DietRestrictAssoc.restriction)
     ).get(food_id)
-
     if not food:
         return jsonify({"error": "Food not found"}), 404
 
-    is_public = food.publication_status == 'public'
-    is_admin = g.user and g.user.role == 'admin'
-    is_owner = g.user and food.user_id == g.user.id
-
-    if is_public or is_admin or is_owner:
-        return jsonify(FoodSchema.model_validate(food).model_dump())
-    else:
-        # Return 404 to conceal the existence of the resource from unauthorized users
-        return jsonify({"error": "Food not found"}), 404
+    return with_cache_headers(jsonify(FoodSchema.model_validate(food).model_dump()), etag, state.updated_at)
 
+@routes.route("/api/foods/category/<int:category_id>", methods=['GET'], defaults={"limit": None, "offset": None, "showhidden": None})
 @routes.route("/api/foods/category/<int:category_id>/<int:limit>/<int:offset>/<string:showhidden>", methods=['GET'])
+@read_only
 @optional_session
-def get_food_by_category(category_id: int, limit: int, offset: int, showhidden: str|bool):
+@conditional_listing
+def get_food_by_category(category_id: int, limit: int|None, offset: int|None, showhidden: str|bool|None):
     """
         HTTP GET
             Returns list of food objects by category. (admins see unlisting and public by default, private based on parameters)
@@ -137,42 +507,18 @@ def get_food_by_category(category_id: int, limit: int, offset: int, showhidden:
             If authenticated, returns all food if admin, returns all public and private if contributor.
             Additional parameters include length of results and offsets (so not all results are returned at once enabling paging)
     """
-    showhidden = str(showhidden).lower() == 'true'
-    query = Food.query.options(
-        joinedload(Food.category),
-        joinedload(Food.cuisine),
-        joinedload(Food.restriction_associations).joinedload(DietRestrictAssoc.restriction)
-    ).filter_by(category_id=category_id)
-
-    if g.user and g.user.role == 'admin':
-        if not showhidden:
-            # Admin sees public, unlisting, and their own private foods by default
-            query = query.filter(
-                or_(
-                    Food.publication_status != 'private',
-                    Food.user_id == g.user.id
-                )
-            )
-        # if showhidden is True, admin sees all, so no filter is applied
-    elif g.user:
-        # Authenticated user (contributor) sees public food and their own private/unlisting food
-        query = query.filter(
-            or_(
-                Food.publication_status == 'public',
-                Food.user_id == g.user.id
-            )
-        )
-    else:
-        # Unauthenticated user sees only public food
-        query = query.filter(Food.publication_status == 'public')
+    showhidden = _showhidden(showhidden)
+    query = Food.query.filter_by(category_id=category_id)
+    query = _filter_visible(query, showhidden)
 
-    foods = query.limit(limit).offset(offset).all()
-    food_schemas = [FoodSchema.model_validate(f).model_dump() for f in foods]
-    return jsonify(food_schemas)
+    return _list_foods(query, limit, offset)
 
+@routes.route("/api/foods/cuisine/<int:cuisine_id>", methods=['GET'], defaults={"limit": None, "offset": None, "showhidden": None})
 @routes.route("/api/foods/cuisine/<int:cuisine_id>/<int:limit>/<int:offset>/<string:showhidden>", methods=['GET'])
+@read_only
 @optional_session
-def get_food_by_cuisine(cuisine_id: int, limit: int, offset: int, showhidden: str|bool):
+@conditional_listing
+def get_food_by_cuisine(cuisine_id: int, limit: int|None, offset: int|None, showhidden: str|bool|None):
     """
         HTTP GET
             Returns list of food objects by cuisine. (admins see unlisting and public by default, private based on parameters)
@@ -182,42 +528,18 @@ def get_food_by_cuisine(cuisine_id: int, limit: int, offset: int, showhidden: st
             has no effect if the user is not an admin.
             Additional parameters include length of results and offsets (so not all results are returned at once enabling paging)
     """
-    showhidden = str(showhidden).lower() == 'true'
-    query = Food.query.options(
-        joinedload(Food.category),
-        joinedload(Food.cuisine),
-        joinedload(Food.restriction_associations).joinedload(DietRestrictAssoc.restriction)
-    ).filter_by(cuisine_id=cuisine_id)
-
-    if g.user and g.user.role == 'admin':
-        if not showhidden:
-            # Admin sees public, unlisting, and their own private foods by default
-            query = query.filter(
-                or_(
-                    Food.publication_status != 'private',
-                    Food.user_id == g.user.id
-                )
-            )
-        # if showhidden is True, admin sees all, so no filter is applied
-    elif g.user:
-        # Authenticated user (contributor) sees public food and their own private/unlisting food
-        query = query.filter(
-            or_(
-                Food.publication_status == 'public',
-                Food.user_id == g.user.id
-            )
-        )
-    else:
-        # Unauthenticated user sees only public food
-        query = query.filter(Food.publication_status == 'public')
+    showhidden = _showhidden(showhidden)
+    query = Food.query.filter_by(cuisine_id=cuisine_id)
+    query = _filter_visible(query, showhidden)
 
-    foods = query.limit(limit).offset(offset).all()
-    food_schemas = [FoodSchema.model_validate(f).model_dump() for f in foods]
-    return jsonify(food_schemas)
+    return _list_foods(query, limit, offset)
 
+@routes.route("/api/foods/diet-restriction/<int:restriction_id>", methods=['GET'], defaults={"limit": None, "offset": None, "showhidden": None})
 @routes.route("/api/foods/diet-restriction/<int:restriction_id>/<int:limit>/<int:offset>/<string:showhidden>", methods=['GET'])
+@read_only
 @optional_session
-def get_food_by_diet_restriction(restriction_id: int, limit: int, offset: int, showhidden: str|bool):
+@conditional_listing
+def get_food_by_diet_restriction(restriction_id: int, limit: int|None, offset: int|None, showhidden: str|bool|None):
     """
         HTTP GET
             Returns list of food objects by dietary restriction. (admins see unlisting and public by default, private based on parameters)
@@ -227,38 +549,11 @@ def get_food_by_diet_restriction(restriction_id: int, limit: int, offset: int, s
             has no effect if the user is not an admin.
             Additional parameters include length of results and offsets (so not all results are returned at once enabling paging)
     """
-    showhidden = str(showhidden).lower() == 'true'
-    query = Food.query.options(
-        joinedload(Food.category),
-        joinedload(Food.cuisine),
-        joinedload(Food.restriction_associations).joinedload(DietRestrictAssoc.restriction)
-    ).join(DietRestrictAssoc).filter(DietRestrictAssoc.restriction_id == restriction_id)
-
-    if g.user and g.user.role == 'admin':
-        if not showhidden:
-            # Admin sees public, unlisting, and their own private foods by default
-            query = query.filter(
-                or_(
-                    Food.publication_status != 'private',
-                    Food.user_id == g.user.id
-                )
-            )
-        # if showhidden is True, admin sees all, so no filter is applied
-    elif g.user:
-        # Authenticated user (contributor) sees public food and their own private/unlisting food
-        query = query.filter(
-            or_(
-                Food.publication_status == 'public',
-                Food.user_id == g.user.id
-            )
-        )
-    else:
-        # Unauthenticated user sees only public food
-        query = query.filter(Food.publication_status == 'public')
+    showhidden = _showhidden(showhidden)
+    query = Food.query.join(DietRestrictAssoc).filter(DietRestrictAssoc.restriction_id == restriction_id)
+    query = _filter_visible(query, showhidden)
 
-    foods = query.limit(limit).offset(offset).all()
-    food_schemas = [FoodSchema.model_validate(f).model_dump() for f in foods]
-    return jsonify(food_schemas)
+    return _list_foods(query, limit, offset)
 
 @routes.route("/api/foods/<int:food_id>", methods=['PATCH'])
 @require_session
@@ -313,9 +608,11 @@ def update_food_by_id(food_id):
         else:
             setattr(food, field, value)
 
-    db.session.commit()
+    _commit_or_revalidate(lambda: UpdateFoodSchema(**data))
 
-    return jsonify(FoodSchema.model_validate(food).model_dump())
+    body = FoodSchema.model_validate(food).model_dump()
+    body["suggested_dietary_restriction_ids"] = _suggested_restriction_ids(food)
+    return jsonify(body)
 
 @routes.route("/api/foods/<int:food_id>", methods=['DELETE'])
 @require_session
@@ -350,16 +647,30 @@ def delete_food_by_id(food_id):
     
     return jsonify({"message": "Food item deleted successfully"}), 200
 
-@routes.route("/api/foods/", methods=['PUT'])
-@require_session
-def create_food():
+def _reload_lookups() -> None:
+    for table in ('categories', 'cuisines', 'dietary_restrictions'):
+        invalidate_lookup(table)
+
+def _commit_or_revalidate(revalidate) -> None:
     """
-    HTTP PUT
-        Insert new food object, food object is required to be private on first creation. Session auth required.
+    Commits a food write. This worker's lookup index may still hold a category, cuisine
+    or restriction deleted through another worker, which fails the commit on its foreign
+    key. In that case the lookups are reloaded and revalidate() runs again, so the request
+    gets the 422 it would have gotten with a current index. An integrity error that
+    survives the reload is re-raised and answered with 409 by handle_integrity_error.
     """
-    data = request.get_json()
-    validated_data = CreateFoodSchema(**data)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        _reload_lookups()
+        revalidate()
+        raise
 
+def _new_food(validated_data: CreateFoodSchema) -> Food:
+    """
+    Builds a private food owned by the current user, with its ingredients and restrictions.
+    """
     new_food = Food(
         user_id=g.user.id,
         name=validated_data.name, # type: ignore
@@ -389,10 +700,141 @@ def create_food():
         assoc = DietRestrictAssoc(restriction_id=restriction_id) # type: ignore
         new_food.restriction_associations.append(assoc)
 
+    return new_food
+
+def _bulk_items() -> list | None:
+    """
+    Items of a bulk request body: a JSON array, or one JSON object per line (NDJSON).
+    Lines that are not valid JSON are returned as None. Returns None if a body
+    that looks like a JSON array does not parse.
+    """
+    body = request.get_data()
+    if body.lstrip().startswith(b'['):
+        try:
+            items = json.loads(body)
+        except ValueError:
+            return None
+        return items if isinstance(items, list) else None
+
+    items = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(None)
+    return items
+
+@routes.route("/api/foods/", methods=['PUT'])
+@require_session
+def create_food():
+    """
+    HTTP PUT
+        Insert new food object, food object is required to be private on first creation. Session auth required.
+    """
+    data = request.get_json()
+    validated_data = CreateFoodSchema(**data)
+    new_food = _new_food(validated_data)
+
     db.session.add(new_food)
+    _commit_or_revalidate(lambda: CreateFoodSchema(**data))
+
+    body = FoodSchema.model_validate(new_food).model_dump()
+    body["suggested_dietary_restriction_ids"] = _suggested_restriction_ids(new_food)
+    return jsonify(body), 201
+
+@routes.route("/api/foods/bulk", methods=['PUT'])
+@require_session
+def create_foods_bulk():
+    """
+    HTTP PUT
+        Insert many new food objects at once from a JSON array or an NDJSON body. Every item is
+        validated first; the valid ones are inserted in a single transaction, flushed in batches.
+        Returns a result per item, in request order. Session auth required.
+    """
+    items = _bulk_items()
+    if items is None:
+        return jsonify({"error": "Request body must be a JSON array or newline delimited JSON objects"}), 400
+    if not items:
+        return jsonify({"error": "No foods given"}), 400
+    if len(items) > MAX_BULK_FOODS:
+        return jsonify({"error": f"At most {MAX_BULK_FOODS} foods can be created per request"}), 413
+
+    try:
+        results, created = _insert_bulk(items)
+    except IntegrityError:
+        # Most likely a lookup row deleted through another worker: validate everything
+        # again against freshly loaded lookups, once (a second failure gets a 409)
+        db.session.rollback()
+        _reload_lookups()
+        results, created = _insert_bulk(items)
+
+    restriction_by_name = get_lookup('dietary_restrictions').names
+    for index, validated_data in created:
+        results[index]["suggested_dietary_restriction_ids"] = suggest_restriction_ids(
+            (ingredient.ingredient_name for ingredient in validated_data.ingredients),
+            restriction_by_name, validated_data.dietary_restriction_ids,
+        )
+
+    failed = len(items) - len(created)
+    return jsonify({"created": len(created), "failed": failed, "results": results}), 207 if failed else 201
+
+def _insert_bulk(items: list) -> tuple[list[dict], list[tuple[int, CreateFoodSchema]]]:
+    """
+    Validates the items of a bulk request and commits the valid ones. Returns the
+    result per item and the (index, validated data) of the created foods.
+    """
+    results: list[dict] = []
+    created: list[tuple[int, CreateFoodSchema, Food]] = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": 400, "error": "Item must be a JSON object"})
+            continue
+        try:
+            validated_data = CreateFoodSchema(**item)
+        except ValidationError as error:
+            results.append({"index": index, "status": 422, "details": error.errors(include_context=False)})
+            continue
+        results.append({"index": index, "status": 201})
+        created.append((index, validated_data, _new_food(validated_data)))
+
+    for start in range(0, len(created), BULK_FLUSH_SIZE):
+        db.session.add_all([food for _, _, food in created[start:start + BULK_FLUSH_SIZE]])
+        db.session.flush()
+    # Ids are read before the commit expires the new foods, so none of them is reloaded
+    for index, _, food in created:
+        results[index]["id"] = food.id
     db.session.commit()
-    
-    return jsonify(FoodSchema.model_validate(new_food).model_dump()), 201
+    return results, [(index, validated_data) for index, validated_data, _ in created]
+
+@routes.route("/api/foods/allergen-suggestions", methods=['GET'])
+@read_only
+@require_role('admin')
+def get_allergen_suggestions():
+    """
+    HTTP GET
+        Re-scans the ingredients of every food and lists the foods missing dietary restrictions
+        implied by their ingredients. Session auth required (admin only).
+    """
+    restriction_by_name = get_lookup('dietary_restrictions').names
+    current: dict[int, set[int]] = {}
+    for food_id, restriction_id in db.session.execute(
+        select(DietRestrictAssoc.food_id, DietRestrictAssoc.restriction_id)
+    ):
+        current.setdefault(food_id, set()).add(restriction_id)
+
+    rows = db.session.execute(
+        select(Ingredient.food_id, Ingredient.ingredient_name)
+        .order_by(Ingredient.food_id)
+        .execution_options(yield_per=1000)
+    )
+    suggestions = []
+    for food_id, group in groupby(rows, key=itemgetter(0)):
+        ids = suggest_restriction_ids((row[1] for row in group), restriction_by_name, current.get(food_id, ()))
+        if ids:
+            suggestions.append({"food_id": food_id, "dietary_restriction_ids": ids})
+    return jsonify({"suggestions": suggestions})
 
 @routes.route("/api/categories/", methods=['POST'])
 @require_role('admin')
@@ -407,6 +849,7 @@ def create_category():
     new_category = Category(category=validated_data.category) # type: ignore
     db.session.add(new_category)
     db.session.commit()
+    invalidate_lookup('categories')
     
     return jsonify(CategorySchema.model_validate(new_category).model_dump()), 201
 
@@ -423,6 +866,7 @@ def create_cuisine():
     new_cuisine = Cuisine(cuisine=validated_data.cuisine) # type: ignore
     db.session.add(new_cuisine)
     db.session.commit()
+    invalidate_lookup('cuisines')
     
     return jsonify(CuisineSchema.model_validate(new_cuisine).model_dump()), 201
 
@@ -439,6 +883,7 @@ def create_diet_restriction():
     new_restriction = DietaryRestriction(restriction=validated_data.restriction) # type: ignore
     db.session.add(new_restriction)
     db.session.commit()
+    invalidate_lookup('dietary_restrictions')
     
     return jsonify(DietaryRestrictionSchema.model_validate(new_restriction).model_dump()), 201
 
@@ -455,6 +900,7 @@ def delete_category_by_id(category_id):
     
     db.session.delete(category)
     db.session.commit()
+    invalidate_lookup('categories')
     
     return jsonify({"message": "Category deleted successfully"}), 200
 
@@ -471,6 +917,7 @@ def delete_cuisine_by_id(cuisine_id):
     
     db.session.delete(cuisine)
     db.session.commit()
+    invalidate_lookup('cuisines')
     
     return jsonify({"message": "Cuisine deleted successfully"}), 200
 
@@ -487,23 +934,54 @@ def delete_diet_restriction_by_id(restriction_id):
     
     db.session.delete(restriction)
     db.session.commit()
+    invalidate_lookup('dietary_restrictions')
     
     return jsonify({"message": "Dietary restriction deleted successfully"}), 200
 
+@routes.route("/api/foods/pending/", methods=['GET'], defaults={"limit": None, "offset": None})
 @routes.route("/api/foods/pending/<int:limit>/<int:offset>/", methods=['GET'])
+@read_only
 @require_role('admin')
-def get_pending_foods(limit:int, offset: int):
+@conditional_listing
+def get_pending_foods(limit: int|None, offset: int|None):
     """
     HTTP GET
-        Returns a list of foods with 'unlisting' publication status.
+        Returns a list of foods with 'unlisting' publication status, oldest first.
         Requires admin role.
     """
-    pending_foods = Food.query.options(
-        joinedload(Food.category),
-        joinedload(Food.cuisine),
-        joinedload(Food.restriction_associations).joinedload(DietRestrictAssoc.restriction)).filter_by(publication_status='unlisting').limit(limit).offset(offset).all()
-    food_schemas = [FoodSchema.model_validate(f).model_dump(by_alias=True, exclude_none=True, exclude_unset=True, exclude_defaults=True) for f in pending_foods]
-    return jsonify(food_schemas), 200
+    query = Food.query.filter_by(publication_status='unlisting')
+    return _list_foods(query, limit, offset, by_name=False,
+                       by_alias=True, exclude_none=True, exclude_unset=True, exclude_defaults=True)
+
+@routes.route("/api/foods/pending/moderate", methods=['POST'])
+@require_role('admin')
+@require_force
+def moderate_pending_foods():
+    """
+    HTTP POST
+        Approves (publishes) or rejects (returns to private) many 'unlisting' foods at once with a
+        single UPDATE. Foods that are not pending are left alone. Reports the ids that changed.
+        Requires admin role and the force confirmation header.
+    """
+    data = request.get_json()
+    validated_data = ModerateFoodsSchema(**data)
+    new_status = 'public' if validated_data.action == 'approve' else 'private'
+    pending = and_(Food.id.in_(validated_data.food_ids), Food.publication_status == 'unlisting')
+
+    # The rows are locked so the reported ids are exactly the ones the UPDATE changes
+    changed = db.session.scalars(select(Food.id).where(pending).order_by(Food.id).with_for_update()).all()
+    if changed:
+        db.session.execute(
+            update(Food).where(Food.id.in_(changed)).values(publication_status=new_status),
+            execution_options={"synchronize_session": False},
+        )
+        food_changes.touch(db.session, changed)
+    db.session.commit()
+    # The UPDATE bypasses the unit of work, so the food indexes are told directly
+    food_changes.notify(changed)
+
+    unchanged = sorted(set(validated_data.food_ids) - set(changed))
+    return jsonify({"publication_status": new_status, "changed": changed, "unchanged": unchanged})
 
 
 
@@ -97,6 +97,7 @@ CREATE TABLE foods (
     sat_fats FLOAT,
     serving_amt FLOAT,
     serving_unit VARCHAR(50),
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     user_id INT,
     category_id INT NOT NULL,
     cuisine_id INT,
@@ -104,14 +105,21 @@ CREATE TABLE foods (
     FOREIGN KEY(user_id) REFERENCES users (id),
     FOREIGN KEY(category_id) REFERENCES categories (id),
     FOREIGN KEY(cuisine_id) REFERENCES cuisines (id),
-    INDEX (name)
+    INDEX (name),
+    INDEX ix_foods_status_name (publication_status, name, id),
+    INDEX ix_foods_status_id (publication_status, id),
+    INDEX ix_foods_category_status_name (category_id, publication_status, name, id),
+    INDEX ix_foods_cuisine_status_name (cuisine_id, publication_status, name, id),
+    INDEX ix_foods_user_status (user_id, publication_status),
+    FULLTEXT INDEX ft_food_name (name)
 );
 
 CREATE TABLE ingredients (
     food_id INT NOT NULL,
     ingredient_name VARCHAR(255) NOT NULL,
     PRIMARY KEY (food_id, ingredient_name),
-    FOREIGN KEY(food_id) REFERENCES foods (id)
+    FOREIGN KEY(food_id) REFERENCES foods (id),
+    FULLTEXT INDEX ft_ingredient_name (ingredient_name)
 );
 
 CREATE TABLE diet_restrict_assoc (
@@ -119,7 +127,27 @@ CREATE TABLE diet_restrict_assoc (
     restriction_id INT NOT NULL,
     PRIMARY KEY (food_id, restriction_id),
     FOREIGN KEY(food_id) REFERENCES foods (id),
-    FOREIGN KEY(restriction_id) REFERENCES dietary_restrictions (id)
+    FOREIGN KEY(restriction_id) REFERENCES dietary_restrictions (id),
+    INDEX ix_diet_restrict_assoc_restriction (restriction_id, food_id)
+);
+
+-- Bumped by every change to foods, see backend/src/allergy_snatcher/models/food_changes.py
+CREATE TABLE catalog_version (
+    id INT NOT NULL,
+    version INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+INSERT INTO catalog_version (id, version) VALUES (1, 0);
+
+-- Content hash of each data file imported by dataimport.py --incremental
+CREATE TABLE import_sources (
+    path VARCHAR(512) NOT NULL,
+    digest CHAR(64) NOT NULL,
+    food_id INT,
+    imported_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (path),
+    FOREIGN KEY(food_id) REFERENCES foods (id) ON DELETE SET NULL
 );
 
 CREATE VIEW food_summary AS
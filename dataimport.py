@@ -4,6 +4,10 @@ import sys
 import logging
 import os
 import argparse
+import hashlib
+import multiprocessing
+import tempfile
+from itertools import islice
 from typing import Optional, Literal
 import importlib
 
@@ -11,7 +15,6 @@ import importlib
 required_modules = {
     "pydantic": "pydantic",
     "pymysql": "PyMySQL",
-    "pydantic_yaml": "pydantic-yaml",
     "yaml": "PyYAML",
     "cryptography": "cryptography"
 }
@@ -33,6 +36,7 @@ if missing_modules:
 
 from pydantic import BaseModel, Field, field_validator, ValidationError, model_validator
 from pymysql import connect
+from pymysql.err import ProgrammingError
 import yaml
 
 logger = logging.getLogger(__name__)
@@ -63,6 +67,11 @@ schema_ex_group.add_argument("-y", "--yaml-schema", help="Output the expected ya
 schema_ex_group.add_argument("-S", "--schema", help="Output the expected yaml schema to STDOUT as json, then exit", action="store_true")
 parser.add_argument("-o", "--output", default=None, help="output SQL to file instead of importing", action="store")
 parser.add_argument("-I", "--ignore-import-error", action="store_true", help="Ignore and skip over data files that failed to parse")
+parser.add_argument("-b", "--batch-size", default=500, type=int, help="Foods per multi-row INSERT")
+parser.add_argument("-C", "--commit-batches", action="store_true", help="Commit every batch on its own when importing into a database, instead of everything at the end. A failed run then leaves the batches already committed in the database")
+parser.add_argument("-j", "--jobs", default=1, type=int, help="Parse and validate data files in this many processes")
+parser.add_argument("-U", "--incremental", action="store_true", help="Only import data files that changed since the last incremental import, updating their foods in place (database import only). Foods imported before without -U are matched by name. Needs migrations/004_import_sources.sql")
+parser.add_argument("-A", "--infer-allergens", action="store_true", help="Add dietary restrictions for allergens found in the ingredients (e.g. Gluten for WHEAT FLOUR)")
 debug_group = parser.add_argument_group('Logging Options')
 debug_group.description ="""
 Changes logging output settings on the level of verbosity.
@@ -91,6 +100,9 @@ Exit codes:
     1 = invalid arguments
     2 = database connection error
     3 = data files parsing error have occurred
+        (nothing is imported into the database, except the batches
+        already committed with -C; with -o the output file is left
+        untouched; SQL printed to STDOUT is partial and must be discarded)
     4 = input directory not found
 """
 
@@ -140,11 +152,54 @@ if args.output and db_arg_used:
     parser.error("argument -o/--output: not allowed with database options")
     sys.exit(1)
 
-from pydantic_yaml import parse_yaml_file_as
+if args.batch_size < 1:
+    parser.error("argument -b/--batch-size: must be at least 1")
+
+if args.jobs < 1:
+    parser.error("argument -j/--jobs: must be at least 1")
+
+if args.commit_batches and not db_arg_used:
+    parser.error("argument -C/--commit-batches: requires database options")
+
+if args.incremental and not db_arg_used:
+    parser.error("argument -U/--incremental: requires database options")
+
+# Prefer the libyaml C loader, it parses several times faster than the pure Python one
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# The allergen matcher is shared with the backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'src'))
+from allergy_snatcher.models.allergens import missing_allergens
+
+allowed_restrictions: list[str] = []
+
+
+class Fats(BaseModel):
+    total: float
+    saturated: float
+    trans: float
+
+class Servings(BaseModel):
+    size: float = Field(description="Serving size in per the unit field")
+    calories : float = Field(description="Calories per serving")
+    unit: Literal['g','mg', 'oz','lb', 'tsp', 'tbsp', 'cup', 'item']
+
+class Nutrition(BaseModel):
+    fats: Fats
+    cholesterol: float
+    sodium: float
+    carbohydrates: float
+    dietary_fiber: float
+    total_sugars: float
+    added_sugars: float
+    protein: float
 
 def create_models(input_dir: Optional[str] = None):
     """
-    Dynamically creates the Pydantic models, loading dietary restrictions
+    Dynamically creates the Pydantic Food model, loading dietary restrictions
     from the specified input directory if provided.
     """
     DietaryRestrictionEnum = str
@@ -158,6 +213,7 @@ def create_models(input_dir: Optional[str] = None):
                     allowed_restrictions_list = [line.strip() for line in f if line.strip()]
                 if allowed_restrictions_list:
                     DietaryRestrictionEnum = Literal[tuple(allowed_restrictions_list)]
+                    allowed_restrictions.extend(allowed_restrictions_list)
                     logger.info(f"Loaded {len(allowed_restrictions_list)} dietary restrictions from {restrictions_path}")
             except Exception as e:
                 logger.warning(f"Could not read {restrictions_path}: {e}. No restrictions will be validated in schema.")
@@ -167,26 +223,6 @@ def create_models(input_dir: Optional[str] = None):
         logger.warning("No input directory provided with -i. No dietary restrictions will be added to the schema.")
 
 
-    class Fats(BaseModel):
-        total: float
-        saturated: float
-        trans: float
-
-    class Servings(BaseModel):
-        size: float = Field(description="Serving size in per the unit field")
-        calories : float = Field(description="Calories per serving")
-        unit: Literal['g','mg', 'oz','lb', 'tsp', 'tbsp', 'cup', 'item']
-
-    class Nutrition(BaseModel):
-        fats: Fats
-        cholesterol: float
-        sodium: float
-        carbohydrates: float
-        dietary_fiber: float
-        total_sugars: float
-        added_sugars: float
-        protein: float
-
     class Food(BaseModel):
         name: str = Field(description="Name of the food", max_length=255)
         brand: str = Field(description="Brand of the food", max_length=100)
@@ -229,6 +265,8 @@ def create_models(input_dir: Optional[str] = None):
             # MUST return 'self' for 'after' validators
             return self
 
+    # Resolvable as a module global, so --jobs workers can pickle validated foods
+    Food.__qualname__ = "Food"
     return Food
 
 Food = create_models(args.input_dir)
@@ -254,33 +292,281 @@ for root, dirs, files in os.walk(inputDir):
         if file.endswith(".yaml") or file.endswith(".yml") or file.endswith(".json"):
             file_list.append(os.path.join(root, file))
 
-foods : list[Food] = [] # pyright: ignore[reportInvalidTypeForm]
-# Parse yml files
-for file in file_list:
+def parse_file(file: str):
+    """
+    Parses and validates one data file. Returns (file, food, error message).
+    Runs in the worker processes with --jobs.
+    """
     try:
         with open(file, 'r') as f:
             if file.endswith('.json'):
                 food = Food.model_validate_json(f.read())
             else:
-                food = parse_yaml_file_as(Food, f)
-        foods.append(food)
-        logger.info(f"Parsed and validated {file}")
-        logger.debug(f"Validated {file}: Food({food})")
+                food = Food.model_validate(yaml.load(f, Loader=YamlLoader))
+        return file, food, None
     except (ValueError, ValidationError, yaml.YAMLError) as e:
-        if args.ignore_import_error:
-            logger.warning(f"Failed to parse or validate {file}: {e}")
-            continue
+        return file, None, str(e)
+
+def parse_files(files: list[str]):
+    """
+    Yields (file, food) for the valid data files in file order, parsing up to --jobs files at once.
+    """
+    jobs = min(args.jobs, len(files))
+    if jobs > 1:
+        try:
+            # Workers are forked so they inherit the models; the script has no __main__ guard to re-import
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            logger.warning("Process pools need fork(), which this platform lacks. Parsing serially.")
+            jobs = 1
+
+    if jobs > 1:
+        with context.Pool(jobs) as pool:
+            yield from check_parsed(pool.imap(parse_file, files, chunksize=8))
+    else:
+        yield from check_parsed(map(parse_file, files))
+
+def check_parsed(results):
+    for file, food, error in results:
+        if error is None:
+            logger.info(f"Parsed and validated {file}")
+            logger.debug(f"Validated {file}: Food({food})")
+            yield file, food
+        elif args.ignore_import_error:
+            logger.warning(f"Failed to parse or validate {file}: {error}")
         else:
-            logger.error(f"Failed to parse or validate {file}: {e}")
+            logger.error(f"Failed to parse or validate {file}: {error}")
             sys.exit(3)
 
-dbscript = """-- Allergy Snatcher Food Import Script
+def infer_allergens(records):
+    for file, food in records:
+        for allergen in sorted(missing_allergens(food.ingredients, food.dietary_restrictions or [])):
+            if allowed_restrictions and allergen not in allowed_restrictions:
+                logger.warning(f"Food '{food.name}' contains {allergen}, which is not an allowed dietary restriction")
+                continue
+            food.dietary_restrictions = [*(food.dietary_restrictions or []), allergen]
+            logger.info(f"Inferred dietary restriction {allergen} for food '{food.name}'")
+        yield file, food
+
+def source_path(file: str) -> str:
+    """Key of a data file in import_sources: its path relative to the input directory."""
+    return os.path.relpath(file, inputDir).replace(os.sep, '/')
+
+def file_digest(file: str) -> str:
+    with open(file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def changed_files(connection, files: list[str]):
+    """
+    Compares the data files with import_sources and returns (changed files, digest per changed
+    file, food id per previously imported file). Unchanged files whose food still exists are
+    left out without being parsed.
+    """
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("SELECT s.path, s.digest, f.id FROM import_sources s LEFT JOIN foods f ON f.id = s.food_id")
+        except ProgrammingError as e:
+            logger.error(f"Failed to read import_sources ({e}). Apply migrations/004_import_sources.sql first.")
+            sys.exit(2)
+        imported = {path: (digest, food_id) for path, digest, food_id in cursor.fetchall()}
+
+    changed, digests = [], {}
+    for file in files:
+        digest = file_digest(file)
+        previous_digest, food_id = imported.get(source_path(file), (None, None))
+        if digest == previous_digest and food_id is not None:
+            continue
+        changed.append(file)
+        digests[file] = digest
+    food_ids = {path: food_id for path, (_, food_id) in imported.items() if food_id is not None}
+    return changed, digests, food_ids
+
+sources = None
+if args.incremental:
+    file_list, source_digests, source_food_ids = changed_files(dbengine, file_list)
+    sources = (source_digests, source_food_ids)
+    logger.warning(f"{len(file_list)} data files are new or changed since the last import")
+
+# Validated foods are streamed to the database or script writer as they are parsed
+records = parse_files(file_list)
+if args.infer_allergens:
+    records = infer_allergens(records)
+
+def report_progress(message: str):
+    """Prints import progress to stderr unless --quiet was given."""
+    if not args.quiet:
+        print(message, file=sys.stderr)
+
+def resolve_lookup_ids(cursor, table: str, column: str, names: set[str]) -> dict[str, int]:
+    """
+    Inserts any missing names into a lookup table and returns name -> id for all of them,
+    with one INSERT and one SELECT.
+    """
+    if not names:
+        return {}
+    names = sorted(names)
+    cursor.executemany(f"INSERT IGNORE INTO {table} ({column}) VALUES (%s)", names)
+    cursor.execute(f"SELECT id, {column} FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(names))})", names)
+    # MySQL compares names case-insensitively, so match them the same way
+    ids = {name.casefold(): row_id for row_id, name in cursor.fetchall()}
+    resolved = {}
+    for name in names:
+        if name.casefold() in ids:
+            resolved[name] = ids[name.casefold()]
+        else:
+            # Collation rules beyond case folding (accents, padding): ask the database
+            cursor.execute(f"SELECT id FROM {table} WHERE {column} = %s", (name,))
+            resolved[name] = cursor.fetchone()[0]
+    return resolved
+
+def food_values(food) -> list:
+    """Values of the foods columns set from a data file, in FOOD_COLUMNS order."""
+    nutrition, servings = food.nutrition, food.servings
+    return [
+        food.name, food.brand, servings.calories, nutrition.dietary_fiber,
+        nutrition.total_sugars, nutrition.protein, nutrition.carbohydrates, nutrition.cholesterol,
+        nutrition.sodium, nutrition.fats.trans, nutrition.fats.total, nutrition.fats.saturated,
+        servings.size, servings.unit,
+    ]
+
+FOOD_COLUMNS = ["name", "brand", "cal", "dietary_fiber", "sugars", "protein", "carbs",
+                "cholesterol", "sodium", "trans_fats", "total_fats", "sat_fats", "serving_amt", "serving_unit"]
+
+# The web app derives the ETags of food listings from this counter, so imported foods must move it on
+CATALOG_VERSION_SQL = "INSERT INTO catalog_version (id, version) VALUES (1, 1) ON DUPLICATE KEY UPDATE version = version + 1"
+
+def bulk_import(connection, records, batch_size: int, sources=None, commit_batches: bool = False):
+    """
+    Imports foods directly into the database as they arrive. Each batch of foods is inserted with
+    a single multi-row INSERT, their ingredients and dietary restrictions with executemany. Lookup
+    ids are resolved once per name and reused. Everything is committed at the end, so a data file
+    failing to parse (exit 3) imports nothing; with `commit_batches` every batch is committed on
+    its own and the batches before the failing file stay imported.
+
+    In incremental mode `sources` is (digest per file, food id per imported path): foods imported
+    before from the same file are updated in place, with their ingredients and restrictions
+    replaced, and each file's digest is recorded in import_sources with the batch. A file without
+    an import_sources row takes over a System food of the same name that no file has claimed yet,
+    so foods imported before incremental mode are updated rather than duplicated.
+    """
+    category_ids: dict[str, int] = {}
+    cuisine_ids: dict[str, int] = {}
+    restriction_ids: dict[str, int] = {}
+    imported = 0
+
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT IGNORE INTO users (username, email, role, first_name) VALUES ('System', 'system@local.host', 'admin', 'System')")
+        cursor.execute("SELECT id FROM users WHERE username = 'System'")
+        system_user_id = cursor.fetchone()[0]
+        cursor.execute("SELECT @@auto_increment_increment")
+        id_step = cursor.fetchone()[0]
+
+        insert_columns = ", ".join(FOOD_COLUMNS + ["publication_status", "user_id", "category_id", "cuisine_id"])
+        row_placeholder = "(" + ", ".join(["%s"] * (len(FOOD_COLUMNS) + 4)) + ")"
+        update_sql = ("UPDATE foods SET " + ", ".join(f"{column} = %s" for column in FOOD_COLUMNS + ["category_id", "cuisine_id"])
+                      + " WHERE id = %s")
+
+        while batch := list(islice(records, batch_size)):
+            category_ids.update(resolve_lookup_ids(
+                cursor, "categories", "category", {food.category for _, food in batch if food.category} - category_ids.keys()))
+            cuisine_ids.update(resolve_lookup_ids(
+                cursor, "cuisines", "cuisine", {food.cuisine for _, food in batch if food.cuisine} - cuisine_ids.keys()))
+            restriction_ids.update(resolve_lookup_ids(
+                cursor, "dietary_restrictions", "restriction",
+                {name for _, food in batch for name in food.dietary_restrictions or []} - restriction_ids.keys()))
+
+            # Foods to update in place: imported before from the same file and not deleted since
+            food_ids: dict[str, int] = {}
+            if sources is not None:
+                previous = {file: sources[1][source_path(file)] for file, _ in batch if source_path(file) in sources[1]}
+                if previous:
+                    cursor.execute(f"SELECT id FROM foods WHERE id IN ({', '.join(['%s'] * len(previous))})", list(previous.values()))
+                    existing = {row[0] for row in cursor.fetchall()}
+                    food_ids = {file: food_id for file, food_id in previous.items() if food_id in existing}
+
+                untracked = [(file, food.name) for file, food in batch if source_path(file) not in sources[1]]
+                if untracked:
+                    names = sorted({name for _, name in untracked})
+                    cursor.execute(
+                        "SELECT f.id, f.name FROM foods f LEFT JOIN import_sources s ON s.food_id = f.id "
+                        f"WHERE f.user_id = %s AND s.path IS NULL AND f.name IN ({', '.join(['%s'] * len(names))}) "
+                        "ORDER BY f.id", [system_user_id, *names])
+                    # MySQL compares names case-insensitively; same-named foods are taken in import order
+                    unclaimed: dict[str, list[int]] = {}
+                    for food_id, name in cursor.fetchall():
+                        unclaimed.setdefault(name.casefold(), []).append(food_id)
+                    for file, name in untracked:
+                        if unclaimed.get(name.casefold()):
+                            food_ids[file] = unclaimed[name.casefold()].pop(0)
+
+            updated = [(file, food) for file, food in batch if file in food_ids]
+            new = [(file, food) for file, food in batch if file not in food_ids]
+            if new:
+                values = []
+                for _, food in new:
+                    values += food_values(food) + ['public', system_user_id,
+                                                   category_ids.get(food.category), cuisine_ids.get(food.cuisine)]
+                cursor.execute(f"INSERT INTO foods ({insert_columns}) VALUES " + ", ".join([row_placeholder] * len(new)), values)
+                # A multi-row INSERT gets consecutive ids starting at LAST_INSERT_ID()
+                first_id = cursor.lastrowid
+                food_ids.update((file, first_id + i * id_step) for i, (file, _) in enumerate(new))
+
+            if updated:
+                cursor.executemany(update_sql, [
+                    food_values(food) + [category_ids.get(food.category), cuisine_ids.get(food.cuisine), food_ids[file]]
+                    for file, food in updated
+                ])
+                updated_ids = [food_ids[file] for file, _ in updated]
+                placeholders = ", ".join(["%s"] * len(updated_ids))
+                cursor.execute(f"DELETE FROM ingredients WHERE food_id IN ({placeholders})", updated_ids)
+                cursor.execute(f"DELETE FROM diet_restrict_assoc WHERE food_id IN ({placeholders})", updated_ids)
+
+            ingredients = [(food_ids[file], ingredient) for file, food in batch for ingredient in food.ingredients]
+            if ingredients:
+                cursor.executemany("INSERT INTO ingredients (food_id, ingredient_name) VALUES (%s, %s)", ingredients)
+            assocs = [(food_ids[file], restriction_ids[name]) for file, food in batch
+                      for name in food.dietary_restrictions or []]
+            if assocs:
+                cursor.executemany("INSERT IGNORE INTO diet_restrict_assoc (food_id, restriction_id) VALUES (%s, %s)", assocs)
+            if sources is not None:
+                cursor.execute(
+                    "INSERT INTO import_sources (path, digest, food_id) VALUES "
+                    + ", ".join(["(%s, %s, %s)"] * len(batch))
+                    + " AS new ON DUPLICATE KEY UPDATE digest = new.digest, food_id = new.food_id",
+                    [value for file, _ in batch for value in (source_path(file), sources[0][file], food_ids[file])],
+                )
+            if commit_batches:
+                connection.commit()
+            imported += len(batch)
+            report_progress(f"Imported {imported} foods ({len(file_list)} files found)")
+
+        if sources is None:
+            cursor.execute("UPDATE foods SET publication_status = 'public' WHERE user_id = %s", (system_user_id,))
+        if imported:
+            cursor.execute(CATALOG_VERSION_SQL)
+        connection.commit()
+
+if dbengine is not None:
+    try:
+        bulk_import(dbengine, records, args.batch_size, sources, args.commit_batches)
+    except SystemExit:
+        # A data file failed to parse
+        dbengine.rollback()
+        raise
+    except Exception as e:
+        dbengine.rollback()
+        logger.error(f"Failed to import into the database: {e}")
+        sys.exit(2)
+    sys.exit(0)
+
+SCRIPT_HEADER = """-- Allergy Snatcher Food Import Script
 -- Generated by dataimport.py
 
 -- Create a placeholder 'System' user for data attribution
 -- and set a variable for its ID.
 INSERT IGNORE INTO users (username, email, role, first_name) VALUES ('System', 'system@local.host', 'admin', 'System');
 SET @system_user_id = (SELECT id FROM users WHERE username = 'System');
+SET @id_step = @@auto_increment_increment;
 
 """
 
@@ -292,94 +578,89 @@ def sql_str(value):
     escaped_value = str(value).replace("'", "''")
     return f"'{escaped_value}'"
 
-for food in foods:
-    # --- Category and Cuisine Handling ---    
-    category = food.category
-    cuisine = food.cuisine
-    
-    dbscript += f"-- Processing food: {food.name}\n"
-    if category:
-        dbscript += f"INSERT IGNORE INTO categories (category) VALUES ({sql_str(category)});\n"
-        dbscript += f"SET @category_id = (SELECT id FROM categories WHERE category = {sql_str(category)});\n"
-    else:
-        dbscript += "SET @category_id = NULL;\n"
-
-    if cuisine:
-        dbscript += f"INSERT IGNORE INTO cuisines (cuisine) VALUES ({sql_str(cuisine)});\n"
-        dbscript += f"SET @cuisine_id = (SELECT id FROM cuisines WHERE cuisine = {sql_str(cuisine)});\n"
-    else:
-        dbscript += "SET @cuisine_id = NULL;\n"
-
-    # --- Main Food Record Insert ---
-    nutrition = food.nutrition
-    fats = nutrition.fats
-    servings = food.servings
-
-    food_insert_sql = f"""INSERT INTO foods (
+def lookup_statements(variables: dict[str, str], table: str, column: str, names: set[str]) -> str:
+    """
+    SQL that inserts the lookup names not seen yet and stores each of their ids in a variable,
+    recording name -> variable in `variables`.
+    """
+    new_names = sorted(names - variables.keys())
+    if not new_names:
+        return ""
+    sql = f"INSERT IGNORE INTO {table} ({column}) VALUES " + ", ".join(f"({sql_str(name)})" for name in new_names) + ";\n"
+    for name in new_names:
+        variables[name] = f"@{column}_{len(variables) + 1}"
+        sql += f"SET {variables[name]} = (SELECT id FROM {table} WHERE {column} = {sql_str(name)});\n"
+    return sql
+
+def write_script(out, records, batch_size: int):
+    """
+    Writes the import script to `out` while foods arrive, one batch at a time: the batch's new lookup
+    names, one multi-row INSERT for its foods, then one each for their ingredients and dietary
+    restrictions, which address the foods relative to LAST_INSERT_ID(). Memory use does not grow
+    with the number of foods. Batches are written before later files are parsed, so a parse error
+    (exit 3) cuts the script short.
+    """
+    category_vars: dict[str, str] = {}
+    cuisine_vars: dict[str, str] = {}
+    restriction_vars: dict[str, str] = {}
+    written = 0
+
+    out.write(SCRIPT_HEADER)
+    while batch := [food for _, food in islice(records, batch_size)]:
+        sql = f"-- Foods {written + 1} to {written + len(batch)}\n"
+        sql += lookup_statements(category_vars, "categories", "category", {food.category for food in batch if food.category})
+        sql += lookup_statements(cuisine_vars, "cuisines", "cuisine", {food.cuisine for food in batch if food.cuisine})
+        sql += lookup_statements(restriction_vars, "dietary_restrictions", "restriction",
+                                 {name for food in batch for name in food.dietary_restrictions or []})
+
+        rows = []
+        for food in batch:
+            nutrition, servings = food.nutrition, food.servings
+            values = [
+                sql_str(food.name), sql_str(food.brand), "'public'", servings.calories, nutrition.dietary_fiber,
+                nutrition.total_sugars, nutrition.protein, nutrition.carbohydrates, nutrition.cholesterol,
+                nutrition.sodium, nutrition.fats.trans, nutrition.fats.total, nutrition.fats.saturated,
+                servings.size, sql_str(servings.unit), "@system_user_id",
+                category_vars.get(food.category, "NULL"), cuisine_vars.get(food.cuisine, "NULL"),
+            ]
+            rows.append("(" + ", ".join(str(value) for value in values) + ")")
+        sql += """INSERT INTO foods (
     name, brand, publication_status, cal, dietary_fiber, sugars, protein, carbs,
     cholesterol, sodium, trans_fats, total_fats, sat_fats, serving_amt, serving_unit,
     user_id, category_id, cuisine_id
-) VALUES (
-    {sql_str(food.name)},
-    {sql_str(food.brand)},
-    'public',
-    {servings.calories},
-    {nutrition.dietary_fiber},
-    {nutrition.total_sugars},
-    {nutrition.protein},
-    {nutrition.carbohydrates},
-    {nutrition.cholesterol},
-    {nutrition.sodium},
-    {fats.trans},
-    {fats.total},
-    {fats.saturated},
-    {servings.size},
-    {sql_str(servings.unit)},
-    @system_user_id,
-    @category_id,
-    @cuisine_id
-);\n"""
-    dbscript += food_insert_sql
-    dbscript += "SET @food_id = LAST_INSERT_ID();\n\n"
-
-    # --- Ingredients Insert ---
-    ingredients = food.ingredients
-    if ingredients:
-        dbscript += "-- Ingredients\n"
-        for ingredient in ingredients:
-            dbscript += f"INSERT INTO ingredients (food_id, ingredient_name) VALUES (@food_id, {sql_str(ingredient)});\n"
-        dbscript += "\n"
-
-    # --- Dietary Restrictions Insert ---
-    restrictions = food.dietary_restrictions
-    if restrictions:
-        dbscript += "-- Dietary Restrictions\n"
-        for restriction in restrictions:
-            dbscript += f"INSERT IGNORE INTO dietary_restrictions (restriction) VALUES ({sql_str(restriction)});\n"
-            dbscript += f"SET @restriction_id = (SELECT id FROM dietary_restrictions WHERE restriction = {sql_str(restriction)});\n"
-            dbscript += f"INSERT IGNORE INTO diet_restrict_assoc (food_id, restriction_id) VALUES (@food_id, @restriction_id);\n"
-        dbscript += "\n"
-
-    dbscript += "\n"
-dbscript += "UPDATE foods SET publication_status = 'public' WHERE user_id = @system_user_id;\n"
+) VALUES\n""" + ",\n".join(rows) + ";\n"
+        # A multi-row INSERT gets consecutive ids starting at LAST_INSERT_ID()
+        sql += "SET @food_id = LAST_INSERT_ID();\n"
+
+        ingredients = [f"(@food_id + {i} * @id_step, {sql_str(ingredient)})"
+                       for i, food in enumerate(batch) for ingredient in food.ingredients]
+        if ingredients:
+            sql += "INSERT INTO ingredients (food_id, ingredient_name) VALUES\n" + ",\n".join(ingredients) + ";\n"
+        assocs = [f"(@food_id + {i} * @id_step, {restriction_vars[name]})"
+                  for i, food in enumerate(batch) for name in food.dietary_restrictions or []]
+        if assocs:
+            sql += "INSERT IGNORE INTO diet_restrict_assoc (food_id, restriction_id) VALUES\n" + ",\n".join(assocs) + ";\n"
+
+        out.write(sql + "\n")
+        written += len(batch)
+
+    out.write("UPDATE foods SET publication_status = 'public' WHERE user_id = @system_user_id;\n")
+    out.write(CATALOG_VERSION_SQL + ";\n")
 
 if args.output:
-    with open(args.output, 'w') as f:
-        f.write(dbscript)
+    # The script is written next to the output file and moved into place once it is complete,
+    # so a data file failing to parse (exit 3) does not leave a truncated script behind
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(args.output)), suffix='.sql.tmp')
+    try:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        with os.fdopen(fd, 'w') as f:
+            write_script(f, records, args.batch_size)
+        os.replace(temp_path, args.output)
+    except BaseException:
+        os.remove(temp_path)
+        raise
 else:
-    if dbengine is not None:
-        try:
-            with dbengine.cursor() as cursor:
-                # PyMySQL does not support multi-statement queries in a single .execute() call.
-                # We must split the script into individual statements and execute them one by one.
-                for statement in dbscript.split(';'):
-                    # Skip empty statements that can result from splitting
-                    if statement.strip():
-                        cursor.execute(statement)
-                dbengine.commit()
-        except Exception as e:
-            logger.error(f"Failed to execute database script: {e}")
-            sys.exit(2)
-    else:
-        print(dbscript)
-sys.exit(0)
\ No newline at end of file
+    write_script(sys.stdout, records, args.batch_size)
+sys.exit(0)
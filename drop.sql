@@ -15,9 +15,11 @@ SET FOREIGN_KEY_CHECKS = 0;
 -- ---------- CHILD TABLES (depend on others) ----------
 DROP TABLE IF EXISTS diet_restrict_assoc;
 DROP TABLE IF EXISTS ingredients;
+DROP TABLE IF EXISTS import_sources;
 
 -- ---------- PARENT TABLES ----------
 DROP TABLE IF EXISTS foods;
+DROP TABLE IF EXISTS catalog_version;
 DROP TABLE IF EXISTS dietary_restrictions;
 DROP TABLE IF EXISTS categories;
 DROP TABLE IF EXISTS cuisines;
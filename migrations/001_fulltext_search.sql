@@ -0,0 +1,4 @@
+-- Full-text indexes for GET /api/foods/text-search.
+-- create.sql already includes them; apply this to databases created before.
+ALTER TABLE foods ADD FULLTEXT INDEX ft_food_name (name);
+ALTER TABLE ingredients ADD FULLTEXT INDEX ft_ingredient_name (ingredient_name);
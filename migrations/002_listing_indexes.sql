@@ -0,0 +1,10 @@
+-- Composite indexes for the food listing visibility filters.
+-- create.sql already includes them; apply this to databases created before.
+ALTER TABLE foods
+    ADD INDEX ix_foods_status_name (publication_status, name, id),
+    ADD INDEX ix_foods_status_id (publication_status, id),
+    ADD INDEX ix_foods_category_status_name (category_id, publication_status, name, id),
+    ADD INDEX ix_foods_cuisine_status_name (cuisine_id, publication_status, name, id),
+    ADD INDEX ix_foods_user_status (user_id, publication_status);
+ALTER TABLE diet_restrict_assoc
+    ADD INDEX ix_diet_restrict_assoc_restriction (restriction_id, food_id);
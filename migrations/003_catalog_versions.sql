@@ -0,0 +1,11 @@
+-- Versions behind the ETag/Last-Modified headers of the food read routes.
+-- create.sql already includes them; apply this to databases created before.
+ALTER TABLE foods
+    ADD COLUMN updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP AFTER serving_unit;
+CREATE TABLE catalog_version (
+    id INT NOT NULL,
+    version INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+INSERT INTO catalog_version (id, version) VALUES (1, 0);
@@ -0,0 +1,10 @@
+-- Content hash of each data file imported by dataimport.py --incremental.
+-- create.sql already includes it; apply this to databases created before.
+CREATE TABLE import_sources (
+    path VARCHAR(512) NOT NULL,
+    digest CHAR(64) NOT NULL,
+    food_id INT,
+    imported_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (path),
+    FOREIGN KEY(food_id) REFERENCES foods (id) ON DELETE SET NULL
+);